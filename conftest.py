@@ -0,0 +1,18 @@
+import asyncio
+
+import pytest
+
+# Use uvloop for the test event loop when it is installed (faster call_soon / socket I/O)
+try:
+    import uvloop
+    HAS_UVLOOP = True
+except ImportError:
+    HAS_UVLOOP = False
+
+
+@pytest.fixture(scope="session")
+def event_loop_policy():
+    """Event loop policy used by pytest-asyncio for all async tests and fixtures."""
+    if HAS_UVLOOP:
+        return uvloop.EventLoopPolicy()
+    return asyncio.DefaultEventLoopPolicy()
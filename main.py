@@ -24,4 +24,10 @@ else:
 from petpro_agent.tests.test_agent import main
 
 if __name__ == "__main__":
+    # uvloop (when installed; not available on Windows) cuts per-task scheduling overhead
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     asyncio.run(main())
\ No newline at end of file
@@ -3,6 +3,7 @@ import logging
 import logging.handlers
 import os
 import datetime
+import functools
 import json
 import uuid
 from pathlib import Path
@@ -28,6 +29,13 @@ except ImportError:
         import logging
         logging.warning("App and EventsCompactionConfig not available. Context compaction will be disabled.")
 
+# Import ContextCacheConfig for Gemini context caching (static instruction + history prefix)
+try:
+    from google.adk.agents.context_cache_config import ContextCacheConfig
+except ImportError:
+    # Older ADK versions have no context caching; requests are sent uncached
+    ContextCacheConfig = None
+
 # Create logs directory if it doesn't exist
 logs_dir = Path("logs")
 logs_dir.mkdir(exist_ok=True)
@@ -73,20 +81,32 @@ print("✅ Logging configured with rotation (10MB, 5 backups)")
 CURRENT_DATE = datetime.datetime.now().strftime("%Y-%m-%d")
 
 # Retry configuration to mitigate transient rate limit / server errors
+# Exponential backoff (1s, 2s, 4s, ... capped at 30s) with +/-50% jitter so rate-limited
+# callers do not retry in lockstep
 RETRY_CONFIG = types.HttpRetryOptions(
     attempts=5,
-    exp_base=7,
+    exp_base=2,
     initial_delay=1,
-    http_status_codes=[429, 500, 503, 504],
+    max_delay=30,
+    jitter=0.5,
+    http_status_codes=[429, 500, 502, 503, 504],
 )
 
+# Cached so every agent shares one Gemini instance (and its lazily created genai client)
+@functools.lru_cache(maxsize=None)
 def gemini_model(name: str = "gemini-2.5-flash-lite"):
-    """Return a Gemini model instance with shared retry options."""
+    """Return the shared Gemini model instance for name, with shared retry options."""
     return Gemini(model=name, retry_options=RETRY_CONFIG)
 
 # Application name for ADK Runner and Session
 APP_NAME = "pet_sitter_agent"
 
+# Context cache settings: reuse a cached prompt prefix for up to 10 invocations / 30 minutes.
+# Requests below min_tokens are sent uncached (Gemini has a minimum cacheable size).
+CONTEXT_CACHE_INTERVALS = 10
+CONTEXT_CACHE_TTL_SECONDS = 1800
+CONTEXT_CACHE_MIN_TOKENS = 2048
+
 # Initialize session service (singleton)
 session_service = InMemorySessionService()
 
@@ -162,6 +182,11 @@ async def create_session_with_state(
     
     return session
 
+async def close_http_sessions():
+    """Close shared HTTP client sessions (backend API client). Call once on shutdown."""
+    from .tools.tools import api_client
+    await api_client.close()
+
 # Initialize app with context compaction (singleton, lazy initialization to avoid circular imports)
 def get_app():
     """Get or create the App instance with events compaction enabled."""
@@ -172,6 +197,15 @@ def get_app():
         # SequentialAgent and other composite agents don't have this attribute
         supports_compaction = hasattr(root_agent, 'canonical_model') and root_agent.canonical_model is not None
         
+        # Context caching applies per LLM request, so it works with composite root agents too
+        cache_kwargs = {}
+        if ContextCacheConfig is not None:
+            cache_kwargs["context_cache_config"] = ContextCacheConfig(
+                cache_intervals=CONTEXT_CACHE_INTERVALS,
+                ttl_seconds=CONTEXT_CACHE_TTL_SECONDS,
+                min_tokens=CONTEXT_CACHE_MIN_TOKENS,
+            )
+        
         if _APP_AVAILABLE and App and EventsCompactionConfig and supports_compaction:
             # Configure events compaction: compact after every 5 conversations
             compaction_config = EventsCompactionConfig(
@@ -183,6 +217,7 @@ def get_app():
                 name=APP_NAME,
                 root_agent=root_agent,
                 events_compaction_config=compaction_config,
+                **cache_kwargs,
             )
             print("✅ App created with Events Compaction enabled (interval=5, overlap=1)")
         else:
@@ -194,6 +229,7 @@ def get_app():
                 app = App(
                     name=APP_NAME,
                     root_agent=root_agent,
+                    **cache_kwargs,
                 )
                 if not supports_compaction:
                     print("⚠️ App created without Events Compaction (root agent doesn't support canonical_model)")
@@ -208,47 +244,46 @@ def get_app():
     return get_app._app
 
 # Initialize runner (singleton, lazy initialization to avoid circular imports)
+# lru_cache(maxsize=1) makes every call after the first an O(1) cache hit
+@functools.lru_cache(maxsize=1)
 def get_runner():
     """Get or create the Runner instance with logging plugin and context compaction."""
-    if not hasattr(get_runner, '_runner'):
-        from .utils import create_runner_with_logging
-        
-        app = get_app()
+    from .utils import create_runner_with_logging
+    
+    app = get_app()
+    
+    if app is not None:
+        # Use App-based Runner with compaction
+        runner = create_runner_with_logging(
+            app=app,
+            session_service=session_service,
+            enable_logging=True
+        )
         
-        if app is not None:
-            # Use App-based Runner with compaction
-            runner = create_runner_with_logging(
+        # Fallback to standard Runner with app
+        if runner is None:
+            runner = Runner(
                 app=app,
-                session_service=session_service,
-                enable_logging=True
+                session_service=session_service
             )
-            
-            # Fallback to standard Runner with app
-            if runner is None:
-                runner = Runner(
-                    app=app,
-                    session_service=session_service
-                )
-        else:
-            # Fallback to old-style Runner (if App not available)
-            from . import root_agent
-            runner = create_runner_with_logging(
+    else:
+        # Fallback to old-style Runner (if App not available)
+        from . import root_agent
+        runner = create_runner_with_logging(
+            agent=root_agent,
+            app_name=APP_NAME,
+            session_service=session_service,
+            enable_logging=True
+        )
+        
+        if runner is None:
+            runner = Runner(
                 agent=root_agent,
                 app_name=APP_NAME,
-                session_service=session_service,
-                enable_logging=True
+                session_service=session_service
             )
-            
-            if runner is None:
-                runner = Runner(
-                    agent=root_agent,
-                    app_name=APP_NAME,
-                    session_service=session_service
-                )
-        
-        get_runner._runner = runner
     
-    return get_runner._runner
+    return runner
 
 __all__ = [
     "CURRENT_DATE", 
@@ -258,6 +293,7 @@ __all__ = [
     "session_service",
     "get_app",
     "get_runner",
-    "create_session_with_state"
+    "create_session_with_state",
+    "close_http_sessions",
 ]
 
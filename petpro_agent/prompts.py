@@ -1,4 +1,5 @@
 import datetime
+import functools
 
 # Description constants (kept separate for clarity / reuse)
 INTENT_CLASSIFIER_DESC = "Classify pet sitting conversation intents and extract entities"
@@ -10,7 +11,16 @@ DECISION_MAKER_DESC = "Decide on pet sitting administrative actions: collect inf
 DATE_CALCULATION_AGENT_DESC = "Calculate booking dates from natural language phrases using Python code execution"
 
 # Instruction builders (accept current_date string to preserve dynamic date formatting)
+#
+# Each builder is memoized per date, so rebuilding an agent (or calling a builder from
+# several places) reuses the same prompt string.
 
+def _cached_instruction(builder):
+    """Memoize an instruction builder per current_date."""
+    return functools.lru_cache(maxsize=8)(builder)
+
+
+@_cached_instruction
 def intent_classifier_instruction(current_date: str) -> str:
     return f"""
    You are an intent classification agent for pet sitting group chat conversations.
@@ -85,6 +95,7 @@ def intent_classifier_instruction(current_date: str) -> str:
     Current date: {current_date}
     """
 
+@_cached_instruction
 def customer_agent_instruction(current_date: str) -> str:
     return f"""
     You are responsible for managing customer profiles. This is step 1 of 5 in the booking workflow.
@@ -111,6 +122,7 @@ def customer_agent_instruction(current_date: str) -> str:
     Current date: {current_date}
     """
 
+@_cached_instruction
 def pet_agent_instruction(current_date: str) -> str:
     return f"""
     You are responsible for managing pet profiles. This is step 2 of 5 in the booking workflow.
@@ -147,6 +159,7 @@ def pet_agent_instruction(current_date: str) -> str:
     Current date: {current_date}
     """
 
+@_cached_instruction
 def service_agent_instruction(current_date: str) -> str:
     return f"""
     You are responsible for matching service requests to available services. This is step 3 of 5 in the booking workflow.
@@ -191,6 +204,7 @@ def service_agent_instruction(current_date: str) -> str:
     Current date: {current_date}
     """
 
+@_cached_instruction
 def booking_creation_agent_instruction(current_date: str) -> str:
     return f"""
     You are responsible for creating or updating bookings. This is step 5 of 5 in the booking workflow.
@@ -232,6 +246,7 @@ def booking_creation_agent_instruction(current_date: str) -> str:
     Current date: {current_date}
     """
 
+@_cached_instruction
 def decision_maker_instruction(current_date: str) -> str:
     return f"""
     You are a decision-making agent. Your ONLY job is to output JSON based on the intent.
@@ -305,6 +320,10 @@ def decision_maker_instruction(current_date: str) -> str:
         "action": "invoke_workflow"
     }}
     
+    **VERIFICATION STATE (already extracted from session state - do NOT scan conversation history for IDs):**
+    {{verification_state?}}
+    Copy customer_verified, customer_id, pets_verified, pet_ids and booking_id from this block as-is.
+    
     When casual conversation (intent == CASUAL_CONVERSATION):
     {{
         "should_invoke_workflow": false,
@@ -379,6 +398,7 @@ def decision_maker_instruction(current_date: str) -> str:
     Current date: {current_date}
     """
 
+@_cached_instruction
 def date_calculation_agent_instruction(current_date: str) -> str:
     """Generate instruction for date calculation agent."""
     return rf"""
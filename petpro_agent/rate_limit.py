@@ -0,0 +1,100 @@
+"""
+Client-side adaptive admission control for model-bound work.
+
+Retries (RETRY_CONFIG) only react after Gemini has already answered 429. When many
+conversations run concurrently, every later request is likely to be rejected too.
+AdaptiveLimiter admits work freely (unless an explicit quota is configured) until work
+fails with a rate-limit error. From then on it admits at most ``limit`` units per sliding
+window and adjusts the limit AIMD-style: halved on each further 429, raised by one after
+a run of successes (up to the quota, if any).
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Optional
+
+
+def is_rate_limited(exc: Optional[BaseException]) -> bool:
+    """True for HTTP 429 errors (google.genai APIError.code, aiohttp ClientResponseError.status)."""
+    if exc is None:
+        return False
+    return 429 in (getattr(exc, "code", None), getattr(exc, "status", None), getattr(exc, "status_code", None))
+
+
+class AdaptiveLimiter:
+    """
+    Sliding-window limiter with additive-increase / multiplicative-decrease of the limit.
+
+    Example:
+        limiter = AdaptiveLimiter()  # no throttling until the first 429
+        async with limiter:
+            await run_turn()
+    """
+
+    def __init__(self, limit: Optional[int] = None, window: float = 60.0, min_limit: int = 1, increase_after: int = 10):
+        """
+        Args:
+            limit: Optional quota (maximum admissions per window), also the ceiling for increases.
+                   None admits everything until the first rate-limit error
+            window: Sliding window length in seconds
+            min_limit: Floor for the limit after decreases
+            increase_after: Consecutive successes needed to raise the limit by one
+        """
+        self.max_limit = limit
+        self.min_limit = min_limit if limit is None else min(min_limit, limit)
+        self.window = window
+        self.increase_after = increase_after
+        self.limit = limit  # None: not throttled
+        self._admitted: deque = deque()  # monotonic admission times within the current window
+        self._successes = 0
+        self._lock = asyncio.Lock()
+
+    def _prune(self, now: float) -> None:
+        while self._admitted and now - self._admitted[0] >= self.window:
+            self._admitted.popleft()
+
+    async def acquire(self) -> None:
+        """Wait until the sliding window has room, then record an admission."""
+        # Lock: waiters are admitted in arrival order and one at a time re-check the window
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._prune(now)
+                if self.limit is None or len(self._admitted) < self.limit:
+                    self._admitted.append(now)
+                    return
+                await asyncio.sleep(self._admitted[0] + self.window - now)
+
+    def record_success(self) -> None:
+        if self.limit is None:
+            return
+        self._successes += 1
+        if self._successes >= self.increase_after:
+            self._successes = 0
+            self.limit += 1
+            if self.max_limit is not None:
+                self.limit = min(self.max_limit, self.limit)
+
+    def record_rate_limited(self) -> None:
+        """Halve the limit; without one yet, halve the rate admitted in the current window."""
+        self._successes = 0
+        if self.limit is None:
+            self._prune(time.monotonic())
+            current = len(self._admitted)
+        else:
+            current = self.limit
+        self.limit = max(self.min_limit, current // 2)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc is None:
+            self.record_success()
+        elif is_rate_limited(exc):
+            self.record_rate_limited()
+        return False
+
+
+__all__ = ["AdaptiveLimiter", "is_rate_limited"]
@@ -0,0 +1,83 @@
+"""
+Structured output schemas for LLM agents.
+
+Agents with an ``output_schema`` get Gemini's constrained JSON decoding
+(``response_mime_type="application/json"`` + ``response_schema``), so their output is
+always valid JSON and never needs the fallback strategies in
+``utils.parse_agent_output_json``. ADK also stores the validated result in state as a
+dict under the agent's ``output_key``.
+
+ADK does not allow ``output_schema`` on agents that also have tools, sub-agents or a
+code executor, so only tool-free agents (currently intent_classifier_agent) use these.
+"""
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+Intent = Literal[
+    "BOOKING_REQUEST",
+    "SERVICE_CONFIRMATION",
+    "BOOKING_DETAILS",
+    "PET_SITTER_CONFIRMATION",
+    "FINAL_CONFIRMATION",
+    "CASUAL_CONVERSATION",
+]
+
+
+# Constrained decoding can only emit declared fields, so every entity key the eval goldens
+# and the decision_maker prompt use must be listed below. extra="allow" keeps any other keys
+# (e.g. from a stored dict) when validating instead of dropping them.
+class CustomerEntity(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    name: Optional[str] = None
+    address: Optional[str] = None
+    phone: Optional[str] = None
+    email: Optional[str] = None
+
+
+class PetEntity(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    name: Optional[str] = None
+    type: Optional[str] = None
+    breed: Optional[str] = None
+    age: Optional[float] = None
+    special_needs: Optional[str] = None
+    medication_instructions: Optional[str] = None
+
+
+class BookingEntity(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    dates: Optional[str] = Field(None, description="Relative date phrase, e.g. 'next weekend'")
+    start_date: Optional[str] = Field(None, description="Date phrase for FINAL_CONFIRMATION")
+    times: Optional[str] = None
+    start_time: Optional[str] = Field(None, description="Start time phrase, e.g. '8 AM' or 'Saturday 8 AM'")
+    end_time: Optional[str] = Field(None, description="End time phrase, e.g. '6 PM' or 'Sunday 6 PM'")
+    service_type: Optional[str] = None
+    pricing: Optional[str] = None
+    location: Optional[str] = None
+
+
+class Entities(BaseModel):
+    customer: CustomerEntity = Field(default_factory=CustomerEntity)
+    pets: List[PetEntity] = Field(default_factory=list)
+    booking: BookingEntity = Field(default_factory=BookingEntity)
+
+
+class IntentClassification(BaseModel):
+    """Output of intent_classifier_agent (output_key="intent_classification")."""
+    intent: Intent
+    confidence: float = Field(ge=0.0, le=1.0)
+    entities: Entities = Field(default_factory=Entities)
+    should_execute: bool = False
+
+
+__all__ = [
+    "CustomerEntity",
+    "PetEntity",
+    "BookingEntity",
+    "Entities",
+    "IntentClassification",
+]
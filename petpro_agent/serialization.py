@@ -0,0 +1,35 @@
+"""
+JSON serialization helpers for tool payloads.
+
+Tools return large nested customer/booking/service payloads to the agents as JSON
+strings. orjson encodes and parses these several times faster than the stdlib json
+module, so it is used when installed; otherwise the stdlib is used with matching
+(compact, non-ASCII-escaping) output.
+"""
+import json
+from typing import Any, Union
+
+# Try to import orjson for fast JSON encoding/decoding, fallback to stdlib json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    HAS_ORJSON = False
+
+
+def dumps(obj: Any) -> str:
+    """Serialize obj to a compact JSON string."""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Parse a JSON string (or bytes). Raises ValueError (json.JSONDecodeError) on invalid input."""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+__all__ = ["HAS_ORJSON", "dumps", "loads"]
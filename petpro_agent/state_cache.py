@@ -0,0 +1,125 @@
+"""
+Cross-session caching for state-aware tools.
+
+Within a conversation the ensure_* tools already skip API calls by checking session
+state. A returning customer starting a new session still pays for the full lookup,
+though. The helpers here keep tool results (and the state entries they produced)
+in a process-wide TTL cache so a new session can be hydrated without backend calls.
+"""
+import copy
+import functools
+import inspect
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+
+class TTLCache:
+    """Minimal in-process cache with per-entry expiry and FIFO eviction."""
+
+    def __init__(self, ttl: float = 3600, maxsize: int = 1024):
+        """
+        Args:
+            ttl: Time-to-live in seconds for each entry
+            maxsize: Maximum number of entries kept; the oldest entry is evicted first
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[Hashable, tuple] = {}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if key not in self._data and len(self._data) >= self.maxsize:
+            self._data.pop(next(iter(self._data)))
+        self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None) -> None:
+        """Drop entries whose key matches predicate, or every entry if predicate is None."""
+        if predicate is None:
+            self._data.clear()
+            return
+        for key in [k for k in self._data if predicate(k)]:
+            del self._data[key]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def cache_by(
+    key_fn: Callable[[Dict[str, Any]], Optional[Hashable]],
+    ttl: float = 3600,
+    state_keys: Iterable[str] = (),
+    cache_if: Optional[Callable[[Any], bool]] = None,
+    cache_as: Optional[Callable[[Any], Any]] = None,
+):
+    """
+    Cache an async tool's result across sessions.
+
+    The cache is only consulted when the session does not yet hold the
+    ``state["tool_results"]`` entries listed in ``state_keys``; once a session has
+    its own state the tool runs normally and uses its in-session skip logic. On a
+    hit the cached state entries are copied into the session and the cached result
+    is returned without calling the tool.
+
+    Args:
+        key_fn: Receives the bound call arguments by name and returns the cache key,
+                or None to bypass the cache for this call
+        ttl: Time-to-live in seconds for cached results
+        state_keys: tool_results entries to snapshot after a miss and restore on a hit
+        cache_if: Optional predicate on the result; only matching results are cached
+        cache_as: Optional function mapping a result to the value returned on later hits
+                  (e.g. to report that it was served from the cache)
+
+    The wrapped function exposes its cache as ``.cache`` for invalidation.
+    """
+    state_keys = tuple(state_keys)
+
+    def decorator(func):
+        signature = inspect.signature(func)
+        cache = TTLCache(ttl=ttl)
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = key_fn(bound.arguments)
+
+            tool_context = bound.arguments.get("tool_context")
+            state = getattr(tool_context, "state", None)
+            tool_results = (state.get("tool_results") if state is not None else None) or {}
+
+            if key is None or (state_keys and all(k in tool_results for k in state_keys)):
+                return await func(*args, **kwargs)
+
+            cached = cache.get(key)
+            if cached is not None:
+                result, snapshot = cached
+                if state is not None and snapshot:
+                    tool_results.update(copy.deepcopy(snapshot))
+                    state["tool_results"] = tool_results
+                return result
+
+            result = await func(*args, **kwargs)
+            if cache_if is None or cache_if(result):
+                snapshot = {}
+                if state is not None:
+                    tool_results = state.get("tool_results") or {}
+                    snapshot = {k: copy.deepcopy(tool_results[k]) for k in state_keys if k in tool_results}
+                cache.set(key, (cache_as(result) if cache_as is not None else result, snapshot))
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+__all__ = ["TTLCache", "cache_by"]
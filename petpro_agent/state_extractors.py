@@ -0,0 +1,51 @@
+"""
+Deterministic extraction of verification state from session state.
+
+decision_maker_agent used to find existing customer_id, pet_ids and booking_id by
+reading the conversation history. These values are already stored in session state
+under the agents' output_keys, so they are looked up here in code and passed to the
+decision maker as a compact fact block.
+"""
+from typing import Any, Dict, Optional
+
+from .serialization import dumps
+from .utils import extract_ids_from_context
+
+# State key read by decision_maker_instruction via {verification_state?}
+VERIFICATION_STATE_KEY = "verification_state"
+
+
+def extract_verification_state(session_or_state: Any) -> Dict[str, Any]:
+    """
+    Extract verification flags from a session (or its state).
+
+    Args:
+        session_or_state: ADK Session, CallbackContext, or a state mapping containing
+                          administrative_decision / customer_result / pet_result / booking_result
+
+    Returns:
+        Dict with customer_verified, customer_id, pets_verified, pet_ids and booking_id
+    """
+    state = getattr(session_or_state, "state", session_or_state)
+    ids = extract_ids_from_context(state)
+    return {
+        "customer_verified": bool(ids["customer_id"]),
+        "customer_id": ids["customer_id"],
+        "pets_verified": bool(ids["pet_ids"]),
+        "pet_ids": ids["pet_ids"],
+        "booking_id": ids["booking_id"],
+    }
+
+
+def inject_verification_state(callback_context) -> Optional[Any]:
+    """before_agent_callback that stores the verification state as compact JSON in state."""
+    verification_state = extract_verification_state(callback_context)
+    callback_context.state[VERIFICATION_STATE_KEY] = dumps(verification_state)
+    return None
+
+
+__all__ = [
+    "VERIFICATION_STATE_KEY",
+    "extract_verification_state",
+    "inject_verification_state",
+]
@@ -1,5 +1,6 @@
 from ..prompts import BOOKING_CREATION_DESC, booking_creation_agent_instruction
 from ..config import CURRENT_DATE, gemini_model
+from ..utils import store_parsed_output
 from ..tools import ensure_booking_exists
 from google.adk.agents import LlmAgent
 
@@ -32,7 +33,8 @@ booking_creation_agent = LlmAgent(
     description=BOOKING_CREATION_DESC,
     instruction=booking_creation_agent_instruction(CURRENT_DATE),
     tools=[ensure_booking_exists],
-    output_key="booking_result"
+    output_key="booking_result",
+    after_agent_callback=store_parsed_output("booking_result")
 )
 
 __all__ = ["booking_creation_agent"]
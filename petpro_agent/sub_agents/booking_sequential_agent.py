@@ -4,6 +4,7 @@ from .pet_agent import pet_agent
 from .service_agent import service_agent
 from .date_calculation_agent import date_calculation_agent
 from .booking_creation_agent import booking_creation_agent
+from ..tools import prefetch_session_context_callback
 
 # Define the booking sequential agent -- orchestrates customer, pet, service, date calculation, and booking creation agents in sequence.
 #
@@ -39,10 +40,16 @@ from .booking_creation_agent import booking_creation_agent
 # - Session state maintained by Google ADK's session management
 #
 # The SequentialAgent ensures that state is properly shared while maintaining execution order.
+#
+# PREFETCH:
+# prefetch_session_context_callback (before_agent_callback) loads the professional's services
+# before customer_agent starts, so ensure_service_matched finds them in state. Customer profiles
+# are not prefetched: ensure_customer_exists restores them from its cross-session cache.
 booking_sequential_agent = SequentialAgent(
     name="booking_sequential_agent",
     description="Execute complete booking workflow: customer → pets → service → date calculation → booking creation in sequence with shared state. MUST run all five agents: customer_agent, pet_agent, service_agent, date_calculation_agent, and booking_creation_agent. The final response MUST come from booking_creation_agent.",
-    sub_agents=[customer_agent, pet_agent, service_agent, date_calculation_agent, booking_creation_agent]
+    sub_agents=[customer_agent, pet_agent, service_agent, date_calculation_agent, booking_creation_agent],
+    before_agent_callback=prefetch_session_context_callback
 )
 
 agent = booking_sequential_agent
@@ -1,5 +1,6 @@
 from ..prompts import CUSTOMER_AGENT_DESC, customer_agent_instruction
 from ..config import CURRENT_DATE, gemini_model
+from ..utils import store_parsed_output
 from ..tools import ensure_customer_exists
 from google.adk.agents import LlmAgent
 
@@ -19,7 +20,7 @@ from google.adk.agents import LlmAgent
 #   - professional_id: Professional UUID from session context
 #   - status: "found|created|insufficient_data"
 #   - existing_pets: Array of pet objects (critical for next agent)
-#   - source: "state|api" indicating where customer_id came from
+#   - source: "state|cache|api" indicating where customer_id came from
 #
 # The output is automatically available to downstream agents (pet_agent, booking_creation_agent)
 # via Google ADK's SequentialAgent context passing mechanism.
@@ -29,7 +30,8 @@ customer_agent = LlmAgent(
     description=CUSTOMER_AGENT_DESC,
     instruction=customer_agent_instruction(CURRENT_DATE),
     tools=[ensure_customer_exists],
-    output_key="customer_result"
+    output_key="customer_result",
+    after_agent_callback=store_parsed_output("customer_result")
 )
 
 __all__ = ["customer_agent"]
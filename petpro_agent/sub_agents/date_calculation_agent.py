@@ -9,18 +9,26 @@ from google.adk.agents import LlmAgent
 from google.adk.code_executors import BuiltInCodeExecutor
 from ..prompts import DATE_CALCULATION_AGENT_DESC, date_calculation_agent_instruction
 from ..config import gemini_model, CURRENT_DATE
+from ..utils import store_parsed_output
 
 # Create a specialized agent for date calculations using BuiltInCodeExecutor
 # This agent can generate and execute Python code dynamically to parse natural
 # language date phrases into structured date/time information.
 # It's part of the booking_sequential_agent sequence: customer → pet → service → date → booking
+#
+# WHY BuiltInCodeExecutor:
+# BuiltInCodeExecutor enables Gemini's server-side code execution tool. The generated code
+# runs inside the same model call, so there is no local sandbox to start per invocation.
+# A local executor (e.g. RestrictedPython in a worker process) would instead add a model
+# round-trip per executed code block, since ADK feeds local execution results back to the LLM.
 date_calculation_agent = LlmAgent(
     model=gemini_model(),
     name="date_calculation_agent",
     description=DATE_CALCULATION_AGENT_DESC,
     instruction=date_calculation_agent_instruction(CURRENT_DATE),
     code_executor=BuiltInCodeExecutor(),
-    output_key="date_result"  # Output key for passing results to booking_creation_agent
+    output_key="date_result",  # Output key for passing results to booking_creation_agent
+    after_agent_callback=store_parsed_output("date_result")
 )
 
 __all__ = ["date_calculation_agent"]
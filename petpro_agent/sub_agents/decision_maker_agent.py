@@ -1,5 +1,7 @@
 from ..prompts import DECISION_MAKER_DESC, decision_maker_instruction
 from ..config import CURRENT_DATE, gemini_model
+from ..utils import store_parsed_output
+from ..state_extractors import inject_verification_state
 from google.adk.agents import LlmAgent
 from .booking_sequential_agent import booking_sequential_agent
 
@@ -25,8 +27,10 @@ from .booking_sequential_agent import booking_sequential_agent
 # - Skip redundant API calls when customer/pets already verified
 # - Prioritize update path when booking_id exists
 #
-# The agent analyzes conversation history to extract existing customer_id, pet_ids, and booking_id
-# from previous agent outputs, then includes these in its structured output for optimization.
+# VERIFICATION STATE:
+# existing customer_id, pet_ids and booking_id are extracted from session state in code by
+# inject_verification_state (before_agent_callback) and injected into the instruction via
+# {verification_state?}, so the LLM copies them instead of scanning conversation history.
 #
 # DELEGATION LOGIC:
 # - When should_invoke_workflow=true and confidence >= 85%, delegates to booking_sequential_agent
@@ -38,6 +42,8 @@ decision_maker_agent = LlmAgent(
     description=DECISION_MAKER_DESC,
     instruction=decision_maker_instruction(CURRENT_DATE),
     output_key="administrative_decision",
+    before_agent_callback=inject_verification_state,
+    after_agent_callback=store_parsed_output("administrative_decision"),
     sub_agents=[booking_sequential_agent]
 )
 
@@ -1,13 +1,20 @@
 from ..prompts import INTENT_CLASSIFIER_DESC, intent_classifier_instruction
 from ..config import CURRENT_DATE, gemini_model
+from ..schemas import IntentClassification
 from google.adk.agents import LlmAgent
 
 # Define the intent classifier agent -- responsible for classifying user intents.
+#
+# STRUCTURED OUTPUT:
+# output_schema enables Gemini's constrained JSON decoding, so the classification is always
+# valid JSON matching IntentClassification. ADK stores the validated dict in state under
+# "intent_classification". This agent has no tools, which output_schema requires.
 intent_classifier_agent = LlmAgent(
     name="intent_classifier_agent",
     model=gemini_model(),
     description=INTENT_CLASSIFIER_DESC,
     instruction=intent_classifier_instruction(CURRENT_DATE),
+    output_schema=IntentClassification,
     output_key="intent_classification",
 )
 
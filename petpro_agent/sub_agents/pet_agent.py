@@ -1,5 +1,6 @@
 from ..prompts import PET_AGENT_DESC, pet_agent_instruction
 from ..config import CURRENT_DATE, gemini_model
+from ..utils import store_parsed_output
 from ..tools import ensure_pets_exist
 from google.adk.agents import LlmAgent
 
@@ -30,7 +31,8 @@ pet_agent = LlmAgent(
     description=PET_AGENT_DESC,
     instruction=pet_agent_instruction(CURRENT_DATE),
     tools=[ensure_pets_exist],
-    output_key="pet_result"  # This is intermediate output - SequentialAgent should continue to booking_creation_agent
+    output_key="pet_result",  # This is intermediate output - SequentialAgent should continue to booking_creation_agent
+    after_agent_callback=store_parsed_output("pet_result")
 )
 
 __all__ = ["pet_agent"]
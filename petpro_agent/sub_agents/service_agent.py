@@ -1,5 +1,6 @@
 from ..prompts import SERVICE_AGENT_DESC, service_agent_instruction
 from ..config import CURRENT_DATE, gemini_model
+from ..utils import store_parsed_output
 from ..tools import ensure_service_matched
 from google.adk.agents import LlmAgent
 
@@ -32,7 +33,8 @@ service_agent = LlmAgent(
     description=SERVICE_AGENT_DESC,
     instruction=service_agent_instruction(CURRENT_DATE),
     tools=[ensure_service_matched],
-    output_key="service_result"
+    output_key="service_result",
+    after_agent_callback=store_parsed_output("service_result")
 )
 
 __all__ = ["service_agent"]
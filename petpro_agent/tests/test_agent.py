@@ -1,235 +1,343 @@
 import asyncio
+import contextlib
+import functools
+import logging
+import logging.handlers
+import queue
 import sys
 import os
-from typing import List, Dict
-from dotenv import load_dotenv
+from typing import Dict, Optional, Sequence, Set
 import pytest
 import uuid
+from collections import namedtuple
+from types import MappingProxyType
 
 # Add parent directory to path to allow imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 
 # Google ADK imports
 from google.genai import types
+from google.adk.events import Event
 
-from petpro_agent.config import APP_NAME, session_service, get_runner
+# .env is loaded once while the petpro_agent package imports (agent.py / api_client.py);
+# it is not re-read here
+from petpro_agent.config import APP_NAME, session_service, get_runner, close_http_sessions
+from petpro_agent.rate_limit import AdaptiveLimiter
 
-load_dotenv()
+# Conversation trace logger: the event loop only enqueues records (QueueHandler); a QueueListener
+# thread writes them to stdout, so console I/O never blocks a running turn. The listener only
+# runs inside _trace_logging() (session fixture / main())
+logger = logging.getLogger("petpro_agent.tests")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_trace_queue = queue.SimpleQueue()
+logger.addHandler(logging.handlers.QueueHandler(_trace_queue))
+_trace_listener = logging.handlers.QueueListener(_trace_queue, logging.StreamHandler(sys.stdout))
+
+
+@contextlib.contextmanager
+def _trace_logging():
+    """Run the trace listener thread for the duration of the block; stopping it drains queued records."""
+    _trace_listener.start()
+    try:
+        yield
+    finally:
+        _trace_listener.stop()
+
+
+# Test user owning every session
+_USER_ID = "123e4567-e89b-12d3-a456-426614174001"
+_ROLE_USER = "user"
+
+# One conversation message
+Msg = namedtuple("Msg", ("sender", "message"))
+
+# User turn template (built once, not per message); filled with a message dict via format_map
+_MSG_TEMPLATE = (
+    "NEW MESSAGE: {sender}: {message}\n"
+    "Analyze this new message within the ongoing pet sitting conversation and decide administrative actions."
+)
+
+
+# Agent turns across all testers: unthrottled until Gemini answers 429, then backed off adaptively.
+# PETPRO_TURNS_PER_MINUTE optionally caps turns per minute up front (each turn makes several model calls)
+_turns_per_minute = os.getenv("PETPRO_TURNS_PER_MINUTE")
+_turn_limiter = AdaptiveLimiter(limit=int(_turns_per_minute) if _turns_per_minute else None, window=60.0)
+
+
+@functools.lru_cache(maxsize=256)
+def _build_content(sender: str, message: str) -> types.Content:
+    """Build (and memoize) the user Content for a conversation message."""
+    user_query = _MSG_TEMPLATE.format_map({"sender": sender, "message": message})
+    return types.Content(role=_ROLE_USER, parts=[types.Part(text=user_query)])
+
+
+def _preview(text: str, n: int = 50) -> str:
+    """Return the first n characters of text for logging, with "..." only if truncated."""
+    return text if len(text) <= n else f"{text[:n]}..."
+
+
+async def _aclose(resource):
+    """Call resource.close() (sync or async) if it has one; failures are reported, not raised."""
+    close_method = getattr(resource, "close", None)
+    if callable(close_method):
+        try:
+            result = close_method()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception as e:
+            print(f"⚠️ {type(resource).__name__} close encountered: {e}")
+
+
+async def close_shared_resources(runner=None):
+    """Close the resources shared by every tester exactly once, at program/test-session exit.
+
+    Releases the pooled backend API session (avoids unclosed aiohttp client session
+    warnings), then the runner and the session service where they support close().
+    """
+    await close_http_sessions()
+    for resource in (runner, session_service):
+        if resource is not None:
+            await _aclose(resource)
 
 
 class PetSitterAgentTester:
     def __init__(self):
         self.session = None
+        self._runner = None
+        self._tasks: Set[asyncio.Task] = set()  # Turn tasks started by run_conversation
         self.session_id = str(uuid.uuid4())  # Generate a unique session ID for this tester instance
 
     async def setup(self):
-        """Async setup method to create session."""
+        """Async setup method to create session and resolve the shared runner once."""
+        self._runner = get_runner()
+        await self._create_session()
+
+    async def _create_session(self):
         self.session = await session_service.create_session(
             app_name=APP_NAME,
-            user_id="123e4567-e89b-12d3-a456-426614174001",
+            user_id=_USER_ID,
             session_id=self.session_id
         )
 
+    async def reset_session(self):
+        """Delete the current ADK session and start a fresh one, keeping the runner and HTTP pool."""
+        await session_service.delete_session(
+            app_name=APP_NAME,
+            user_id=_USER_ID,
+            session_id=self.session_id
+        )
+        self.session_id = str(uuid.uuid4())
+        await self._create_session()
+
     async def cleanup(self):
-        """Release resources to avoid unclosed aiohttp client session warnings."""
-        # Wait for all pending tasks to complete (excluding current task)
-        try:
-            current_task = asyncio.current_task()
-            # Get all pending tasks except the current one
-            pending = [task for task in asyncio.all_tasks() 
-                      if not task.done() and task is not current_task]
-            if pending:
-                # Wait for pending tasks with a timeout
-                await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), timeout=2.0)
-        except (asyncio.TimeoutError, RuntimeError, AttributeError):
-            # If timeout, event loop issues, or all_tasks not available, just continue
-            pass
-        
-        # Small delay to ensure cleanup
-        await asyncio.sleep(0.1)
-        
-        # Session service cleanup if available
-        if session_service:
-            close_method = getattr(session_service, "close", None)
-            if callable(close_method):
-                try:
-                    result = close_method()
-                    if asyncio.iscoroutine(result):
-                        await result
-                except Exception as e:
-                    print(f"⚠️ SessionService close encountered: {e}")
-
-    async def run_conversation(self, conversation: List[Dict[str, str]]):
-        """Run agent with conversation messages."""
-        runner = get_runner()
-        for i, msg in enumerate(conversation):
-            print(f"\n{'='*60}")
-            print(f"Processing message {i+1}/{len(conversation)}: {msg['sender']}: {msg['message'][:50]}...")
-            print(f"{'='*60}")
-            
-            user_query = (
-                f"NEW MESSAGE: {msg['sender']}: {msg['message']}\n"
-                "Analyze this new message within the ongoing pet sitting conversation and decide administrative actions."
-            )
-            content = types.Content(role='user', parts=[types.Part(text=user_query)])
-
-            # Consume all events from the async generator to ensure all async operations complete
-            events = []
-            tool_calls_count = 0
-            try:
-                async for event in runner.run_async(
-                    user_id="123e4567-e89b-12d3-a456-426614174001",
-                    session_id=self.session_id,
-                    new_message=content
-                ):
-                    events.append(event)
-                    
-                    # Inspect event structure for debugging
-                    event_type = type(event).__name__
-                    
-                    # Check for tool calls - try multiple possible attributes
-                    tool_calls = None
-                    if hasattr(event, 'tool_calls'):
-                        tool_calls = event.tool_calls
-                    elif hasattr(event, 'tool_call'):
-                        tool_calls = [event.tool_call] if event.tool_call else []
-                    elif hasattr(event, 'function_calls'):
-                        tool_calls = event.function_calls
-                    
-                    if tool_calls:
-                        tool_calls_count += len(tool_calls) if isinstance(tool_calls, list) else 1
-                        for tool_call in (tool_calls if isinstance(tool_calls, list) else [tool_calls]):
-                            tool_name = getattr(tool_call, 'name', None) or getattr(tool_call, 'function_name', None) or str(tool_call)
-                            print(f"🔧 TOOL CALLED: {tool_name} (event_type={event_type})")
-                    
-                    # Check for tool results
-                    tool_results = None
-                    if hasattr(event, 'tool_results'):
-                        tool_results = event.tool_results
-                    elif hasattr(event, 'tool_result'):
-                        tool_results = [event.tool_result] if event.tool_result else []
-                    elif hasattr(event, 'function_results'):
-                        tool_results = event.function_results
-                    
-                    if tool_results:
-                        for tool_result in (tool_results if isinstance(tool_results, list) else [tool_results]):
-                            result_name = getattr(tool_result, 'name', None) or getattr(tool_result, 'function_name', None) or str(tool_result)
-                            print(f"✅ TOOL RESULT: {result_name}")
-                    
-                    # Log agent responses
+        """Cancel and reap the turn tasks this tester still has running (not every task in the loop).
+
+        Turns only outlive run_conversation when a run was aborted (e.g. another scenario
+        failed); cancelling them closes their run_async generator instead of streaming
+        model output nobody will read. The runner, HTTP pool and session service are
+        shared by all testers and are closed once at exit by close_shared_resources().
+        """
+        if self._tasks:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def __aenter__(self):
+        await self.setup()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.cleanup()
+
+    async def _append_history(self, content: types.Content):
+        """Record a message in the session history without running the agent on it."""
+        # Re-fetch: self.session is stale once the runner has appended events to the session
+        self.session = await session_service.get_session(
+            app_name=APP_NAME,
+            user_id=_USER_ID,
+            session_id=self.session_id
+        )
+        event = Event(invocation_id=Event.new_id(), author=_ROLE_USER, content=content)
+        await session_service.append_event(self.session, event)
+
+    async def _run_turn(self, content: types.Content):
+        """Run one agent turn and log its events.
+
+        Returns:
+            Tuple of (event_count, tool_calls_count, last_response)
+        """
+        # Consume all events; aclosing() finalizes the generator (and the work it owns)
+        # deterministically when the turn ends or fails
+        event_count = 0
+        tool_calls_count = 0
+        last_response = None
+        # Admission control: after a 429, concurrent scenarios are throttled locally instead of
+        # spending Gemini round trips on requests that would be rejected
+        async with _turn_limiter:
+            async with contextlib.aclosing(self._runner.run_async(
+                user_id=_USER_ID,
+                session_id=self.session_id,
+                new_message=content
+            )) as agen:
+                async for event in agen:
+                    event_count += 1
+
+                    # ADK Event API: function calls/responses and final response are typed accessors
+                    function_calls = event.get_function_calls()
+                    if function_calls:
+                        tool_calls_count += len(function_calls)
+                        for function_call in function_calls:
+                            logger.info(f"🔧 TOOL CALLED: {function_call.name} (author={event.author})")
+
+                    for function_response in event.get_function_responses():
+                        logger.info(f"✅ TOOL RESULT: {function_response.name}")
+
+                    # Log agent responses (final events without content/parts are skipped)
                     if event.is_final_response():
-                        if hasattr(event, 'content') and event.content:
-                            if hasattr(event.content, 'parts') and event.content.parts:
-                                response_text = event.content.parts[0].text if hasattr(event.content.parts[0], 'text') else str(event.content.parts[0])
-                                print(f"📝 Agent Response: {response_text[:200]}...")
-                    
-                    # Log agent name if available
-                    if hasattr(event, 'agent_name'):
-                        print(f"🤖 Agent: {event.agent_name}")
-                
-                print(f"📊 Summary: {len(events)} events, {tool_calls_count} tool calls")
-                
+                        try:
+                            last_response = event.content.parts[0].text or ""
+                        except (AttributeError, IndexError, TypeError):
+                            pass
+                        else:
+                            logger.info(f"📝 Agent Response: {_preview(last_response, 200)}")
+
+                    # Log agent name
+                    if event.author:
+                        logger.info(f"🤖 Agent: {event.author}")
+
+        return event_count, tool_calls_count, last_response
+
+    async def run_conversation(
+        self,
+        conversation: Sequence[Msg],
+        contents: Optional[Sequence[types.Content]] = None,
+        history_until: int = 0,
+    ):
+        """Run agent with conversation messages.
+
+        Args:
+            conversation: Msg(sender, message) records used for logging
+            contents: Optional pre-built Content per message (e.g. SAMPLE_CONTENTS[name]);
+                      built from conversation when omitted
+            history_until: Opt-in: messages before this index are preloaded into the session
+                           as history (no LLM round-trip) instead of run as agent turns.
+                           Defaults to 0, so every message goes through the agent.
+        """
+        if contents is None:
+            contents = [_build_content(*msg) for msg in conversation]
+        for i, (msg, content) in enumerate(zip(conversation, contents)):
+            if i < history_until:
+                await self._append_history(content)
+                logger.info(f"📚 Preloaded message {i+1}/{len(conversation)} as history: {msg.sender}")
+                continue
+
+            logger.info(f"\n{'='*60}")
+            logger.info(f"Processing message {i+1}/{len(conversation)}: {msg.sender}: {_preview(msg.message)}")
+            logger.info(f"{'='*60}")
+
+            # Each turn runs as a task owned by this tester, so cleanup() touches only its own work.
+            # Awaiting it directly (no shield) lets a cancellation of the caller abort the turn;
+            # _run_turn's aclosing() then finalizes the run_async generator right away.
+            task = asyncio.get_running_loop().create_task(self._run_turn(content))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            try:
+                event_count, tool_calls_count, _ = await task
+                logger.info(f"📊 Summary: {event_count} events, {tool_calls_count} tool calls")
             except Exception as e:
-                print(f"❌ Error processing message: {e}")
+                logger.error(f"❌ Error processing message: {e}")
                 raise
-            finally:
-                # Ensure all async operations complete before moving to next message
-                # Wait for any pending tasks related to this request
-                try:
-                    # Give time for any background HTTP requests to complete
-                    await asyncio.sleep(0.5)
-                    # Check for pending tasks and wait for them
-                    current_task = asyncio.current_task()
-                    pending = [task for task in asyncio.all_tasks() 
-                              if not task.done() and task is not current_task]
-                    if pending:
-                        # Wait for pending tasks with a timeout
-                        await asyncio.wait_for(
-                            asyncio.gather(*pending, return_exceptions=True), 
-                            timeout=3.0
-                        )
-                except (asyncio.TimeoutError, RuntimeError, AttributeError):
-                    # If there are still pending tasks, give them more time
-                    await asyncio.sleep(0.5)
-
-
-SAMPLE_CONVERSATIONS = {  # Sample conversation scenarios
-    "complete_booking": [
-        {"sender": "System",
-         "message": "Mike's pet professional id is ('123e4567-e89b-12d3-a456-426614174001'). Alice is our existing customer and Alice's customer id is ('123e4567-e89b-12d3-a456-426614174004')."},
-        {"sender": "Alice",
-         "message": "Hi Mike! I need someone to watch Bella and Max next weekend. Bella is my 3-year-old Golden Retriever and Max is a 1-year-old tabby cat."},
-        {"sender": "Mike",
-         "message": "My rate is $50/day for both pets. What times work for you?"},
-        {"sender": "Alice",
-         "message": "Perfect! I need you from 8 AM Saturday to 6 PM Sunday. So that's $100 total. My address is 123 Oak Street, and I can leave keys under the mat. Bella needs her medicine at 2 PM daily - it's in the kitchen cabinet."},
-        {"sender": "Mike",
-         "message": "Yes, I can do that weekend! I'll be there Saturday morning. Just to confirm - that's this coming Saturday the 23rd and Sunday the 24th, right?"},
-        {"sender": "Alice", "message": "Yes exactly! Thanks Mike, you're the best. See you Saturday!"}
-    ]
+
+# Sample conversation scenarios (static: read-only mapping of Msg tuples)
+SAMPLE_CONVERSATIONS = MappingProxyType({
+    "complete_booking": (
+        Msg("System",
+            "Mike's pet professional id is ('123e4567-e89b-12d3-a456-426614174001'). Alice is our existing customer and Alice's customer id is ('123e4567-e89b-12d3-a456-426614174004')."),
+        Msg("Alice",
+            "Hi Mike! I need someone to watch Bella and Max next weekend. Bella is my 3-year-old Golden Retriever and Max is a 1-year-old tabby cat."),
+        Msg("Mike",
+            "My rate is $50/day for both pets. What times work for you?"),
+        Msg("Alice",
+            "Perfect! I need you from 8 AM Saturday to 6 PM Sunday. So that's $100 total. My address is 123 Oak Street, and I can leave keys under the mat. Bella needs her medicine at 2 PM daily - it's in the kitchen cabinet."),
+        Msg("Mike",
+            "Yes, I can do that weekend! I'll be there Saturday morning. Just to confirm - that's this coming Saturday the 23rd and Sunday the 24th, right?"),
+        Msg("Alice", "Yes exactly! Thanks Mike, you're the best. See you Saturday!"),
+    ),
+})
+
+# Pre-built user Content per scenario (SAMPLE_CONVERSATIONS is static)
+SAMPLE_CONTENTS: Dict[str, tuple] = {
+    name: tuple(_build_content(*msg) for msg in conversation)
+    for name, conversation in SAMPLE_CONVERSATIONS.items()
 }
 
-@pytest.fixture(scope="function")
-async def agent_tester():
-    """Fixture with function scope to ensure proper cleanup."""
-    tester = PetSitterAgentTester()
-    await tester.setup()
-    try:
-        yield tester
-    finally:
-        # Wait for any remaining async operations to complete
+@pytest.fixture(scope="session")
+async def _session_tester():
+    """One tester (runner + HTTP pool) for the whole test session; closed once at the end.
+
+    Requires the session-scoped event loop configured in pytest.ini.
+    """
+    with _trace_logging():
+        tester = PetSitterAgentTester()
         try:
-            await asyncio.sleep(0.3)
-            current_task = asyncio.current_task()
-            pending = [task for task in asyncio.all_tasks() 
-                      if not task.done() and task is not current_task]
-            if pending:
-                await asyncio.wait_for(
-                    asyncio.gather(*pending, return_exceptions=True), 
-                    timeout=2.0
-                )
-        except (asyncio.TimeoutError, RuntimeError, AttributeError):
-            pass
+            async with tester:
+                yield tester
         finally:
-            await tester.cleanup()
+            await close_shared_resources(tester._runner)
+
+@pytest.fixture
+async def agent_tester(_session_tester):
+    """Shared tester with a fresh ADK session per test (previous session is deleted)."""
+    yield _session_tester
+    await _session_tester.reset_session()
 
 @pytest.mark.asyncio
 async def test_complete_booking_scenario(agent_tester):
     """Test the complete booking conversation scenario."""
     conversation = SAMPLE_CONVERSATIONS["complete_booking"]
-    await agent_tester.run_conversation(conversation)
+    await agent_tester.run_conversation(conversation, SAMPLE_CONTENTS["complete_booking"])
     # Add assertions as needed (example: check session is not None)
     assert agent_tester.session is not None
 
 @pytest.mark.asyncio
-async def test_agent_initialization():
-    tester = PetSitterAgentTester()
-    await tester.setup()
-    assert tester.session is not None
-    assert get_runner() is not None
-    await tester.cleanup()
+async def test_agent_initialization(agent_tester):
+    assert agent_tester.session is not None
+    assert get_runner() is agent_tester._runner
 
 async def main():
-    print("🐕 Pet Sitter AI Agent - Test Program")
-    print("=" * 50)
-    print("Available test scenarios:")
-    sitter_agent = PetSitterAgentTester()
+    with _trace_logging():
+        print("🐕 Pet Sitter AI Agent - Test Program")
+        print("=" * 50)
+        print("Available test scenarios:")
+        # One tester (own session) per scenario: scenarios are independent, so they run concurrently
+        # and the total time is that of the slowest scenario rather than the sum
+        testers = {name: PetSitterAgentTester() for name in SAMPLE_CONVERSATIONS}
 
-    try:
-        await sitter_agent.setup()
-
-        for key in SAMPLE_CONVERSATIONS.keys():
-            print(f"  - {key}")
+        try:
+            async with contextlib.AsyncExitStack() as stack:
+                for tester in testers.values():
+                    await stack.enter_async_context(tester)
 
-        print("\n" + "=" * 50 + "\n")
-        
-        for scenario_name, conversation in SAMPLE_CONVERSATIONS.items():
-            print(f"📋 Running scenario: {scenario_name}")
-            await sitter_agent.run_conversation(conversation)
-            print("\n" + "=" * 50 + "\n")
-    finally:
-        await sitter_agent.cleanup()
+                for key in SAMPLE_CONVERSATIONS.keys():
+                    print(f"  - {key}")
 
+                print("\n" + "=" * 50 + "\n")
+            
+                print(f"📋 Running scenarios: {', '.join(testers)}")
+                await asyncio.gather(*(
+                    tester.run_conversation(SAMPLE_CONVERSATIONS[name], SAMPLE_CONTENTS[name])
+                    for name, tester in testers.items()
+                ))
+                print("\n" + "=" * 50 + "\n")
+        finally:
+            # All testers share one runner (get_runner()), HTTP pool and session service: close them once
+            await close_shared_resources(next(iter(testers.values()))._runner)
 
 if __name__ == "__main__":
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     asyncio.run(main())
@@ -0,0 +1,84 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Add parent directory to path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from petpro_agent import rate_limit
+from petpro_agent.rate_limit import AdaptiveLimiter, is_rate_limited
+
+
+class _RateLimited(Exception):
+    code = 429
+
+
+def test_is_rate_limited_checks_status_codes():
+    assert is_rate_limited(_RateLimited())
+    assert is_rate_limited(SimpleNamespace(status=429))
+    assert is_rate_limited(SimpleNamespace(status_code=429))
+    assert not is_rate_limited(SimpleNamespace(status=500))
+    assert not is_rate_limited(ValueError())
+    assert not is_rate_limited(None)
+
+
+async def test_unthrottled_until_rate_limited(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    limiter = AdaptiveLimiter(window=60.0)
+    for _ in range(8):
+        async with limiter:
+            pass
+    assert limiter.limit is None
+
+    # First 429: the limit becomes half the rate admitted in the current window
+    try:
+        async with limiter:
+            raise _RateLimited()
+    except _RateLimited:
+        pass
+    assert limiter.limit == 4
+
+    # Admissions from past windows no longer count
+    now[0] += 61.0
+    limiter.record_rate_limited()
+    assert limiter.limit == 2
+
+
+async def test_other_errors_do_not_change_the_limit():
+    limiter = AdaptiveLimiter(limit=4)
+    try:
+        async with limiter:
+            raise ValueError()
+    except ValueError:
+        pass
+    assert limiter.limit == 4
+
+
+def test_limit_is_halved_and_raised_within_bounds():
+    limiter = AdaptiveLimiter(limit=8, min_limit=3, increase_after=2)
+    limiter.record_rate_limited()
+    assert limiter.limit == 4
+    limiter.record_rate_limited()
+    assert limiter.limit == 3
+    for _ in range(20):
+        limiter.record_success()
+    assert limiter.limit == 8
+
+
+async def test_acquire_waits_for_the_window(monkeypatch):
+    now = [0.0]
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        now[0] += delay
+
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", fake_sleep)
+    limiter = AdaptiveLimiter(limit=2, window=10.0)
+    await limiter.acquire()
+    now[0] += 4.0
+    await limiter.acquire()
+    await limiter.acquire()
+    assert sleeps == [6.0]
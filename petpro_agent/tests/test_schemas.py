@@ -0,0 +1,33 @@
+import json
+import os
+import sys
+
+# Add parent directory to path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from petpro_agent.schemas import IntentClassification
+
+GOLDENS_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "eval", "data", "intent_classifier_eval.test.json"
+)
+
+
+def _golden_outputs():
+    with open(GOLDENS_PATH, "r") as f:
+        eval_set = json.load(f)
+    for case in eval_set["eval_cases"]:
+        for invocation in case["conversation"]:
+            for part in invocation["final_response"]["parts"]:
+                if part.get("text"):
+                    yield case["eval_id"], json.loads(part["text"])
+
+
+def test_eval_golden_entities_validate_against_schema():
+    outputs = list(_golden_outputs())
+    assert outputs
+    for eval_id, output in outputs:
+        parsed = IntentClassification.model_validate(output)
+        # Every golden entity key must be a declared field: constrained decoding cannot emit extras
+        entities = parsed.entities
+        for entity in [entities.customer, entities.booking, *entities.pets]:
+            assert not entity.model_extra, (eval_id, entity.model_extra)
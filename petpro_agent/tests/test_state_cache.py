@@ -0,0 +1,81 @@
+import os
+import sys
+from types import SimpleNamespace
+
+# Add parent directory to path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from petpro_agent import state_cache
+from petpro_agent.state_cache import TTLCache, cache_by
+
+
+def test_ttl_cache_expires_entries(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(state_cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache(ttl=10)
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    now[0] += 10.5
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_evicts_oldest_and_invalidates():
+    cache = TTLCache(ttl=60, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert cache.get("a") is None
+    assert (cache.get("b"), cache.get("c")) == (2, 3)
+    cache.invalidate(lambda key: key == "b")
+    assert cache.get("b") is None and cache.get("c") == 3
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def _tool_context():
+    return SimpleNamespace(state={})
+
+
+async def test_cache_by_restores_state_on_hit():
+    calls = []
+
+    @cache_by(lambda args: args["professional_id"], state_keys=("lookup",))
+    async def lookup(tool_context, professional_id):
+        calls.append(professional_id)
+        tool_context.state["tool_results"] = {"lookup": {"extracted": {"id": professional_id}}}
+        return {"id": professional_id}
+
+    assert await lookup(_tool_context(), "p1") == {"id": "p1"}
+
+    # New session: served from the cache, and the stored state entry is copied in
+    context = _tool_context()
+    assert await lookup(context, "p1") == {"id": "p1"}
+    assert calls == ["p1"]
+    assert context.state["tool_results"] == {"lookup": {"extracted": {"id": "p1"}}}
+
+    # Session already holds its own state: the tool runs normally
+    await lookup(context, "p1")
+    assert calls == ["p1", "p1"]
+
+
+async def test_cache_by_skips_results_rejected_by_cache_if():
+    calls = []
+
+    @cache_by(lambda args: args["key"], cache_if=lambda result: result["success"])
+    async def tool(tool_context, key):
+        calls.append(key)
+        return {"success": False}
+
+    await tool(_tool_context(), "k")
+    await tool(_tool_context(), "k")
+    assert calls == ["k", "k"]
+
+
+async def test_cache_by_replays_cache_as_value():
+    @cache_by(lambda args: args["key"], cache_as=lambda result: dict(result, source="cache"))
+    async def tool(tool_context, key):
+        return {"source": "api"}
+
+    assert await tool(_tool_context(), "k") == {"source": "api"}
+    assert await tool(_tool_context(), "k") == {"source": "cache"}
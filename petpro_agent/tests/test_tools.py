@@ -0,0 +1,188 @@
+import asyncio
+import copy
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+# Add parent directory to path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from petpro_agent.tools import tools as tools_module
+from petpro_agent.tools.tools import (
+    _AMPM_RE,
+    _fetch_services,
+    _to_24h,
+    add_booking_fields,
+    ensure_customer_exists,
+    extract_booking_fields,
+    extract_service_fields,
+    match_customer,
+    prefetch_session_context_callback,
+    replace_booking_fields,
+    resolve_service_id,
+)
+
+CUSTOMERS = [
+    {"id": "c1", "firstName": "", "lastName": "", "email": "", "phone": ""},
+    {"id": "c2", "firstName": "Alice", "lastName": "Smith", "email": "Alice@Example.com", "phone": "555-0101"},
+]
+
+
+def test_match_customer_by_name():
+    assert match_customer(CUSTOMERS, name="alice smith")["id"] == "c2"
+    assert match_customer(CUSTOMERS, name="Alice")["id"] == "c2"
+
+
+def test_match_customer_skips_unnamed_customers():
+    # An empty stored name is a substring of every name and must not match
+    assert match_customer(CUSTOMERS, name="Bob Jones") is None
+
+
+def test_match_customer_by_contact():
+    assert match_customer(CUSTOMERS, email="alice@example.com")["id"] == "c2"
+    assert match_customer(CUSTOMERS, phone="555-0101")["id"] == "c2"
+
+
+BOOKINGS = [
+    {"id": "b1", "clientId": "c1", "bookingPets": [{"petId": "p1"}, {"petId": "p2"}]},
+    {"id": "b2", "clientId": "c2", "bookingPets": [{"petId": "p3"}]},
+]
+
+
+def test_extract_booking_fields_is_json_serializable():
+    extracted = extract_booking_fields(BOOKINGS)
+    assert extracted["customer_ids"] == ["c1", "c2"]
+    assert extracted["pet_ids"] == ["p1", "p2", "p3"]
+    json.dumps(extracted)  # Stored in session state
+
+
+def test_add_booking_fields_matches_full_extract():
+    bookings = copy.deepcopy(BOOKINGS)
+    extracted = extract_booking_fields(bookings)
+    new_booking = {"id": "b3", "clientId": "c1", "bookingPets": [{"petId": "p2"}, {"petId": "p4"}]}
+    bookings.append(new_booking)
+    assert add_booking_fields(extracted, bookings, new_booking) == extract_booking_fields(bookings)
+    json.dumps(extracted)
+
+
+def test_replace_booking_fields_matches_full_extract():
+    for new_booking in (
+        {"id": "b2", "clientId": "c2", "bookingPets": [{"petId": "p3"}], "notes": "same ids"},
+        {"id": "b2", "clientId": "c3", "bookingPets": [{"petId": "p5"}]},
+    ):
+        bookings = copy.deepcopy(BOOKINGS)
+        extracted = extract_booking_fields(bookings)
+        old_booking, bookings[1] = bookings[1], new_booking
+        assert replace_booking_fields(extracted, bookings, old_booking, new_booking) == extract_booking_fields(bookings)
+
+
+def test_to_24h_converts_12_hour_times():
+    hours = {text: _to_24h(_AMPM_RE.search(text)) for text in ("12 AM", "12 PM", "6 PM", "6am", "15 AM")}
+    # Out-of-range hours are passed through unchanged, as the original branches did
+    assert hours == {"12 AM": 0, "12 PM": 12, "6 PM": 18, "6am": 6, "15 AM": 15}
+
+
+SERVICES = [
+    {"id": "s1", "name": "Dog Walking"},
+    {"id": "s2", "name": "Overnight Pet Sitting "},
+    {"id": "s3", "name": "dog walking"},
+]
+
+
+def test_resolve_service_id_exact_name_ignores_case():
+    extracted = extract_service_fields(SERVICES)
+    assert resolve_service_id("DOG WALKING", extracted) == "s1"  # First service with a name wins
+    assert resolve_service_id(" overnight pet sitting", extracted) == "s2"
+    assert resolve_service_id("", extracted) is None
+    assert resolve_service_id("Dog Walking", {}) is None
+
+
+def test_resolve_service_id_reads_legacy_service_map(monkeypatch):
+    monkeypatch.setattr(tools_module, "HAS_FUZZY_MATCHING", False)
+    extracted = {"service_map": {"Dog Walking": "s1"}}
+    assert resolve_service_id("dog walking", extracted) == "s1"
+    assert resolve_service_id("dog walkng", extracted) is None
+
+
+def test_resolve_service_id_fuzzy_match():
+    if not tools_module.HAS_FUZZY_MATCHING:
+        return
+    extracted = extract_service_fields(SERVICES)
+    assert resolve_service_id("overnite pet sitting", extracted) == "s2"
+    assert resolve_service_id("grooming", extracted) is None
+
+
+async def test_fetch_services_shares_one_call_and_returns_copies(monkeypatch):
+    calls = []
+
+    async def get_services(professional_id):
+        calls.append(professional_id)
+        await asyncio.sleep(0)
+        return [{"id": "s1", "name": "Dog Walking"}]
+
+    monkeypatch.setattr(tools_module.api_client, "get_services_by_professional_id", get_services)
+    tools_module._services_cache.invalidate()
+
+    first, second = await asyncio.gather(_fetch_services("p1"), _fetch_services("p1"))
+    assert calls == ["p1"]
+    assert first == second and first is not second
+    assert not tools_module._services_inflight
+
+    # A session mutating its copy does not leak into the cached response
+    first[0]["name"] = "changed"
+    assert (await _fetch_services("p1"))[0]["name"] == "Dog Walking"
+    tools_module._services_cache.invalidate()
+
+
+async def test_booking_turn_prefetch_keeps_customer_cache_in_use(monkeypatch):
+    customer_calls = []
+
+    async def get_customers(professional_id):
+        customer_calls.append(professional_id)
+        return copy.deepcopy(CUSTOMERS)
+
+    async def get_services(professional_id):
+        return [{"id": "s1", "name": "Dog Walking"}]
+
+    monkeypatch.setattr(tools_module.api_client, "get_customer_profiles_by_pet_professionals_id", get_customers)
+    monkeypatch.setattr(tools_module.api_client, "get_services_by_professional_id", get_services)
+    ensure_customer_exists.cache.invalidate()
+    tools_module._services_cache.invalidate()
+
+    # Two fresh sessions for a returning customer, each starting a booking turn
+    for _ in range(2):
+        context = SimpleNamespace(state={}, user_id="p1")
+        await prefetch_session_context_callback(context)
+        result = json.loads(await ensure_customer_exists(context, "p1", customer_phone="555-0101"))
+        assert result["customer_id"] == "c2"
+        assert "get_customer_profile" in context.state["tool_results"]
+    assert customer_calls == ["p1"]
+    ensure_customer_exists.cache.invalidate()
+    tools_module._services_cache.invalidate()
+
+
+async def test_cached_customer_is_replayed_as_found_from_cache(monkeypatch):
+    customers = []
+
+    async def get_customers(professional_id):
+        return copy.deepcopy(customers)
+
+    async def create_customer(customer_data):
+        customer = dict(customer_data, id="c3", pets=[])
+        customers.append(customer)
+        return customer
+
+    monkeypatch.setattr(tools_module.api_client, "get_customer_profiles_by_pet_professionals_id", get_customers)
+    monkeypatch.setattr(tools_module.api_client, "create_customer", create_customer)
+    ensure_customer_exists.cache.invalidate()
+
+    args = ("p1", "Bob Jones", None, "555-0199")
+    created = json.loads(await ensure_customer_exists(SimpleNamespace(state={}), *args))
+    assert (created["status"], created["source"]) == ("created", "api")
+
+    # The customer exists now: a later session is told so, and that no API call was made
+    replayed = json.loads(await ensure_customer_exists(SimpleNamespace(state={}), *args))
+    assert replayed["customer_id"] == "c3"
+    assert (replayed["status"], replayed["source"], replayed["message"]) == ("found", "cache", "Customer found")
+    ensure_customer_exists.cache.invalidate()
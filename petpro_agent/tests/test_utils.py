@@ -0,0 +1,65 @@
+import json
+import os
+import sys
+
+# Add parent directory to path to allow imports
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from petpro_agent.utils import extract_ids_from_context, parse_agent_output_json
+
+
+def test_parse_plain_and_code_block_json():
+    assert parse_agent_output_json('{"customer_id": "c1"}') == {"customer_id": "c1"}
+    assert parse_agent_output_json('Result:\n```json\n{"customer_id": "c1"}\n```') == {"customer_id": "c1"}
+
+
+def test_parse_json_embedded_in_text():
+    text = 'Here you go: {"customer": {"id": "c1", "pets": [{"id": "p1"}]}, "note": "a } in a string"} done'
+    assert parse_agent_output_json(text) == {
+        "customer": {"id": "c1", "pets": [{"id": "p1"}]},
+        "note": "a } in a string",
+    }
+
+
+def test_parse_skips_unclosed_brace_in_prose():
+    assert parse_agent_output_json('use {placeholders like this and {"booking_id": "b1"}') == {"booking_id": "b1"}
+
+
+def test_parse_resyncs_after_unclosed_brace_with_stray_quotes():
+    assert parse_agent_output_json('Note {see "Max\'s" notes: {"customer_id": "c1"}') == {"customer_id": "c1"}
+    assert parse_agent_output_json('Note {see "Max\'s notes: {"customer_id": "c1"}') == {"customer_id": "c1"}
+    assert parse_agent_output_json('say {"hi} and {x {"customer_id": "c1"}') == {"customer_id": "c1"}
+
+
+def test_parse_returns_none_without_json():
+    assert parse_agent_output_json("no json here") is None
+    assert parse_agent_output_json("") is None
+
+
+def test_extract_ids_follows_source_order():
+    context = {
+        "administrative_decision": {"customer_id": None, "pet_ids": None, "booking_id": None},
+        "customer_result": json.dumps({"customer_id": "c1"}),
+        "pet_result": "```json\n" + json.dumps({"pet_ids": ["p1", "p2"]}) + "\n```",
+        "booking_result": json.dumps({"customer_id": "c2", "pet_ids": ["p9"], "existing_booking_id": "b1"}),
+    }
+    assert extract_ids_from_context(context) == {"customer_id": "c1", "pet_ids": ["p1", "p2"], "booking_id": "b1"}
+
+    context["administrative_decision"] = {"customer_id": "c0", "pet_ids": ["p0"], "booking_id": "b0"}
+    assert extract_ids_from_context(context) == {"customer_id": "c0", "pet_ids": ["p0"], "booking_id": "b0"}
+
+
+def test_extract_ids_ignores_bad_values_and_missing_context():
+    empty = {"customer_id": None, "pet_ids": None, "booking_id": None}
+    assert extract_ids_from_context({}) == empty
+    assert extract_ids_from_context({"customer_result": "not json", "pet_result": '{"pet_ids": "p1"}'}) == empty
+
+
+def test_extract_ids_returns_independent_lists():
+    context = {"pet_result": json.dumps({"pet_ids": ["p1"]})}
+    extract_ids_from_context(context)["pet_ids"].append("p2")
+    assert extract_ids_from_context(context)["pet_ids"] == ["p1"]
+
+    stored = {"pet_ids": ["p1"]}
+    extract_ids_from_context({"pet_result": stored})["pet_ids"].append("p2")
+    assert stored == {"pet_ids": ["p1"]}
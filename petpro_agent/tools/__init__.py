@@ -1,19 +1,39 @@
-# Import all tool functions from tools.py
-from .tools import (
-    get_customer_profile,
-    create_customer,
-    create_pet_profiles,
-    get_services,
-    get_bookings,
-    create_booking,
-    update_booking,
+# Tool functions live in tools.py and are loaded lazily on first attribute access (PEP 562),
+# so importing a sibling module (e.g. api_client) does not initialize every tool.
+import importlib
+
+_EXPORTS = {
+    "get_customer_profile": ".tools",
+    "create_customer": ".tools",
+    "create_pet_profiles": ".tools",
+    "get_services": ".tools",
+    "get_bookings": ".tools",
+    "create_booking": ".tools",
+    "update_booking": ".tools",
     # State-aware wrapper tools
-    ensure_customer_exists,
-    ensure_pets_exist,
-    ensure_service_matched,
-    ensure_booking_exists,
-    match_service,
-)
+    "ensure_customer_exists": ".tools",
+    "ensure_pets_exist": ".tools",
+    "ensure_service_matched": ".tools",
+    "ensure_booking_exists": ".tools",
+    "match_service": ".tools",
+    # Callbacks
+    "prefetch_session_context": ".tools",
+    "prefetch_session_context_callback": ".tools",
+}
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # Cache so later lookups bypass __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
+
 
 __all__ = [
     "get_customer_profile",
@@ -29,4 +49,7 @@ __all__ = [
     "ensure_service_matched",
     "ensure_booking_exists",
     "match_service",
+    # Callbacks
+    "prefetch_session_context",
+    "prefetch_session_context_callback",
 ]
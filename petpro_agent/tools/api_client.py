@@ -1,3 +1,4 @@
+import asyncio
 import json
 from typing import Dict, List
 import os
@@ -12,17 +13,51 @@ class PetProfessionalsAPIClient:
     def __init__(self):
         self.base_url = os.getenv("PET_PROFESSIONALS_API_BASE_URL")
         self.api_key = os.getenv("PET_PROFESSIONALS_API_KEY")
+        # One pooled session per event loop: a ClientSession is bound to the loop it was created on
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
 
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the running loop's shared ClientSession, creating it on first use.
+
+        One pooled session per loop is reused for all requests so connections (and TLS
+        sessions) are kept alive between calls. Sessions of loops that have since closed
+        are dropped whenever a new session is created, so processes that run many loops
+        (e.g. repeated asyncio.run) do not accumulate connectors.
+        """
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            # A closed loop can no longer run session.close(); its transports went down with it
+            self._sessions = {
+                other: other_session for other, other_session in self._sessions.items()
+                if not other.is_closed() and not other_session.closed
+            }
+            connector = aiohttp.TCPConnector(limit=256, ttl_dns_cache=300, enable_cleanup_closed=True)
+            session = self._sessions[loop] = aiohttp.ClientSession(connector=connector)
+        return session
+
+    async def close(self):
+        """Close every ClientSession this client opened (call once on shutdown)."""
+        current = asyncio.get_running_loop()
+        sessions, self._sessions = self._sessions, {}
+        for loop, session in sessions.items():
+            if session.closed:
+                continue
+            if loop is current:
+                await session.close()
+            elif loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(session.close(), loop))
+            # A session whose loop is already closed has had its transports torn down with it
 
     # Get existing customers profiles by pet professionals id
     async def get_customer_profiles_by_pet_professionals_id(self, pet_professionals_id: str) -> Dict:
         """Get existing customers profiles by pet professionals id"""
         url = f"{self.base_url}/api/v1/customers/professional/{pet_professionals_id}"
         headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                response.raise_for_status()
-                return await response.json()
+        session = self._get_session()
+        async with session.get(url, headers=headers) as response:
+            response.raise_for_status()
+            return await response.json()
 
     # Create new customer profile
     async def create_customer(self, customer_data: Dict) -> Dict:
@@ -40,10 +75,10 @@ class PetProfessionalsAPIClient:
         """
         url = f"{self.base_url}/api/v1/customers"
         headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"} if self.api_key else {"Content-Type": "application/json"}
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=customer_data) as response:
-                response.raise_for_status()
-                return await response.json()
+        session = self._get_session()
+        async with session.post(url, headers=headers, json=customer_data) as response:
+            response.raise_for_status()
+            return await response.json()
 
 
     # Add new Pet profiles to existing customer
@@ -63,20 +98,20 @@ class PetProfessionalsAPIClient:
 
         url = f"{self.base_url}/api/v1/customers/{customer_id}"
         headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"} if self.api_key else {"Content-Type": "application/json"}
-        async with aiohttp.ClientSession() as session:
-            async with session.put(url, headers=headers, json=customer_data) as response:
-                response.raise_for_status()
-                return await response.json()
+        session = self._get_session()
+        async with session.put(url, headers=headers, json=customer_data) as response:
+            response.raise_for_status()
+            return await response.json()
 
     # Get services by professional id
     async def get_services_by_professional_id(self, professional_id: str) -> Dict:
         """Get services information by professional id"""
         url = f"{self.base_url}/api/v1/services/professional/{professional_id}/active"
         headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                response.raise_for_status()
-                return await response.json()
+        session = self._get_session()
+        async with session.get(url, headers=headers) as response:
+            response.raise_for_status()
+            return await response.json()
 
     # Get bookings by professional id
     async def get_bookings_by_professional_id(self, professional_id: str) -> List[Dict]:
@@ -118,10 +153,10 @@ class PetProfessionalsAPIClient:
         """
         url = f"{self.base_url}/api/v1/bookings/professional/{professional_id}"
         headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as response:
-                response.raise_for_status()
-                return await response.json()
+        session = self._get_session()
+        async with session.get(url, headers=headers) as response:
+            response.raise_for_status()
+            return await response.json()
 
     # Create new booking
     async def create_booking(self, booking_data: Dict) -> Dict:
@@ -147,16 +182,16 @@ class PetProfessionalsAPIClient:
         print(f"🔍 DEBUG - Booking URL: {url}")
         print(f"🔍 DEBUG - Booking Data: {json.dumps(booking_data, indent=2)}")
 
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, headers=headers, json=booking_data) as response:
-                response_text = await response.text()
-                print(f"🔍 DEBUG - Response Status: {response.status}")
-                print(f"🔍 DEBUG - Response Text: {response_text}")
+        session = self._get_session()
+        async with session.post(url, headers=headers, json=booking_data) as response:
+            response_text = await response.text()
+            print(f"🔍 DEBUG - Response Status: {response.status}")
+            print(f"🔍 DEBUG - Response Text: {response_text}")
 
-                if response.status >= 400:
-                    raise Exception(f"API Error {response.status}: {response_text}")
+            if response.status >= 400:
+                raise Exception(f"API Error {response.status}: {response_text}")
 
-                return await response.json() if response_text else {}
+            return await response.json() if response_text else {}
 
     # Update existing booking
     async def update_booking(self, booking_id: str, booking_data: Dict) -> Dict:
@@ -191,14 +226,14 @@ class PetProfessionalsAPIClient:
         print(f"🔍 DEBUG - Update Booking URL: {url}")
         print(f"🔍 DEBUG - Update Booking Data: {json.dumps(booking_data, indent=2)}")
 
-        async with aiohttp.ClientSession() as session:
-            async with session.put(url, headers=headers, json=booking_data) as response:
-                response_text = await response.text()
-                print(f"🔍 DEBUG - Response Status: {response.status}")
-                print(f"🔍 DEBUG - Response Text: {response_text}")
+        session = self._get_session()
+        async with session.put(url, headers=headers, json=booking_data) as response:
+            response_text = await response.text()
+            print(f"🔍 DEBUG - Response Status: {response.status}")
+            print(f"🔍 DEBUG - Response Text: {response_text}")
 
-                if response.status >= 400:
-                    raise Exception(f"API Error {response.status}: {response_text}")
+            if response.status >= 400:
+                raise Exception(f"API Error {response.status}: {response_text}")
 
-                return await response.json() if response_text else {}
+            return await response.json() if response_text else {}
 
@@ -1,7 +1,15 @@
 from .api_client import PetProfessionalsAPIClient
-import json
-import time
-from typing import Dict, List, Any, Optional
+from ..state_cache import TTLCache, cache_by
+from ..utils import get_state
+from ..serialization import dumps, loads
+from ..config import CURRENT_DATE
+import asyncio
+import copy
+import itertools
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Tuple, TypedDict
 
 try:
     from google.adk.tools.tool_context import ToolContext
@@ -10,16 +18,174 @@ except ImportError:
     from typing import Any
     ToolContext = Any  # Type hint fallback
 
-# Try to import rapidfuzz for fuzzy string matching, fallback to simple matching
+# Try to import rapidfuzz (C++ scorers) for fuzzy string matching, then fuzzywuzzy,
+# fallback to simple matching
 try:
-    from rapidfuzz import fuzz
+    from rapidfuzz import fuzz, process
     HAS_FUZZY_MATCHING = True
 except ImportError:
-    HAS_FUZZY_MATCHING = False
+    try:
+        from fuzzywuzzy import fuzz, process
+        HAS_FUZZY_MATCHING = True
+    except ImportError:
+        HAS_FUZZY_MATCHING = False
+
+# Try to import pyahocorasick for single-pass keyword matching, fallback to substring checks
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
 
 # Initialize the API client
 api_client = PetProfessionalsAPIClient()
 
+# How long a resolved customer (and the customer list it came from) is reused across sessions
+CUSTOMER_CACHE_TTL_SECONDS = 3600
+
+# How long a professional's get_services response is reused (services change rarely)
+SERVICES_CACHE_TTL_SECONDS = 60
+_services_cache = TTLCache(ttl=SERVICES_CACHE_TTL_SECONDS)
+# In-flight fetches keyed by (event loop, professional_id); entries are removed when the
+# fetch finishes, so the map only ever holds concurrent misses
+_services_inflight: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+
+
+async def _load_services(professional_id: str) -> Any:
+    result = await api_client.get_services_by_professional_id(professional_id)
+    _services_cache.set(professional_id, result)
+    return result
+
+
+async def _fetch_services(professional_id: str) -> Any:
+    """Fetch a professional's active services, reusing a response cached within the TTL.
+
+    Concurrent misses for the same professional (on the same event loop) share one API
+    call. Each caller gets its own deep copy, since the result is stored in (and may be
+    mutated through) a single session's state.
+    """
+    cached = _services_cache.get(professional_id)
+    if cached is None:
+        key = (asyncio.get_running_loop(), professional_id)
+        fetch = _services_inflight.get(key)
+        if fetch is None:
+            fetch = asyncio.ensure_future(_load_services(professional_id))
+            _services_inflight[key] = fetch
+            fetch.add_done_callback(lambda _, key=key: _services_inflight.pop(key, None))
+        # shield: a cancelled caller must not cancel the fetch other callers are waiting on
+        cached = await asyncio.shield(fetch)
+    return copy.deepcopy(cached)
+
+
+def _tool_state(tool_context: ToolContext) -> Optional[Any]:
+    """Return the session state of tool_context, or None when there is none (no hasattr probing)."""
+    try:
+        return tool_context.state
+    except AttributeError:
+        return None
+
+
+def _get_tool_results(tool_context: ToolContext, create: bool = False) -> Optional[Dict[str, Any]]:
+    """Return state["tool_results"] (created empty if create=True), or None without session state."""
+    state = _tool_state(tool_context)
+    if state is None:
+        return None
+    tool_results = state.get("tool_results")
+    if tool_results is None and create:
+        tool_results = {}
+        state["tool_results"] = tool_results
+    return tool_results
+
+
+def _get_tool_state(tool_context: ToolContext, tool_name: str) -> Optional[Dict[str, Any]]:
+    """Return state["tool_results"][tool_name], or None if that tool has not stored a result."""
+    tool_results = _get_tool_results(tool_context)
+    return tool_results.get(tool_name) if tool_results else None
+
+
+@dataclass(slots=True)
+class CustomerIndex:
+    """Customer fields the ensure_* tools read from state, resolved in one walk.
+
+    customer_id / professional_id / pets / pet_ids describe the first (current)
+    customer; customers and extracted are the stored get_customer_profile results.
+    """
+    customer_id: Optional[str] = None
+    professional_id: Optional[str] = None
+    customers: List[Dict[str, Any]] = field(default_factory=list)
+    pets: List[Dict[str, Any]] = field(default_factory=list)
+    pet_ids: List[str] = field(default_factory=list)
+    extracted: Optional[Dict[str, Any]] = None
+
+
+def _get_customer_index(state: Any) -> CustomerIndex:
+    """Build a CustomerIndex from state["tool_results"]["get_customer_profile"] (empty if absent)."""
+    index = CustomerIndex()
+    customer_state = state.get("tool_results", {}).get("get_customer_profile") if state is not None else None
+    if not customer_state:
+        return index
+    extracted = customer_state.get("extracted", {})
+    index.extracted = extracted
+    index.customer_id = extracted.get("customer_id")
+    customers = extracted.get("customers")
+    if customers and isinstance(customers, list):
+        index.customers = customers
+        first_customer = customers[0]
+        if isinstance(first_customer, dict):
+            index.professional_id = first_customer.get("professionalId")
+            pets = first_customer.get("pets")
+            if isinstance(pets, list):
+                index.pets = pets
+                index.pet_ids = [p.get("id") for p in pets if isinstance(p, dict) and p.get("id")]
+    return index
+
+
+def _store_tool_result(tool_context: ToolContext, tool_name: str, result: Any, extracted: Dict[str, Any]) -> None:
+    """Store a read tool's full response and extracted fields in state["tool_results"][tool_name]."""
+    tool_results = _get_tool_results(tool_context, create=True)
+    if tool_results is not None:
+        tool_results[tool_name] = {
+            "full_response": result,
+            "extracted": extracted
+        }
+
+
+def _load_payload(payload: Any) -> Dict[str, Any]:
+    """Parse a mutation tool's *_data_json argument.
+
+    The LLM always passes a JSON string; the ensure_* tools pass their dict directly
+    to skip a dumps/loads round-trip. Dicts are shallow-copied since the tools fill in
+    missing fields.
+    """
+    if isinstance(payload, dict):
+        return dict(payload)
+    return loads(payload)
+
+
+class ToolResult(TypedDict, total=False):
+    """Backend tool envelope. Kept as a dict between tools and only encoded by _to_json for the agent."""
+    success: bool
+    data: Any
+    error: str
+    from_cache: bool
+
+
+def _ok(data: Any, from_cache: bool = False) -> ToolResult:
+    """Tool success envelope."""
+    if from_cache:
+        return {"success": True, "data": data, "from_cache": True}
+    return {"success": True, "data": data}
+
+
+def _err(error: Any) -> ToolResult:
+    """Tool failure envelope ({"success": false, "error": str(error)})."""
+    return {"success": False, "error": str(error)}
+
+
+def _to_json(result: ToolResult) -> str:
+    """Encode a ToolResult for the agent."""
+    return dumps(result)
+
 
 # Helper functions for extracting fields from API responses
 def extract_customer_fields(customer_response: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -33,29 +199,154 @@ def extract_customer_fields(customer_response: List[Dict[str, Any]]) -> Dict[str
         - customer_id: First customer ID if found
         - customers: Full list of customers
         - existing_pets: List of all pets from all customers
+        - customer_index_by_id / customer_index_by_email / customer_index_by_phone:
+          Positions in customers keyed by id, lowercased email and phone (first match wins)
+        - customer_names_lower: Lowercased "firstName lastName" per customer (parallel to customers)
     """
+    is_list = isinstance(customer_response, list)
     extracted = {
         "customer_id": None,
-        "customers": customer_response if isinstance(customer_response, list) else [],
-        "existing_pets": []
+        "customers": customer_response if is_list else [],
+        "existing_pets": [],
+        "customer_index_by_id": {},
+        "customer_index_by_email": {},
+        "customer_index_by_phone": {},
+        "customer_names_lower": [],
     }
     
-    if isinstance(customer_response, list) and len(customer_response) > 0:
+    if is_list and customer_response:
         # Get first customer ID (most common use case)
         first_customer = customer_response[0]
-        if isinstance(first_customer, dict) and "id" in first_customer:
-            extracted["customer_id"] = first_customer["id"]
-        
-        # Extract all pets from all customers
-        for customer in customer_response:
-            if isinstance(customer, dict) and "pets" in customer:
-                pets = customer.get("pets", [])
-                if isinstance(pets, list):
-                    extracted["existing_pets"].extend(pets)
+        first_id = first_customer.get("id") if isinstance(first_customer, dict) else None
+        if first_id:
+            extracted["customer_id"] = first_id
+        
+        # Index customers for O(1) lookups
+        for position, customer in enumerate(customer_response):
+            _index_customer(extracted, customer, position)
+        
+        # Extract all pets from all customers (concatenated in one pass by itertools)
+        extracted["existing_pets"] = list(itertools.chain.from_iterable(map(_customer_pets, customer_response)))
     
     return extracted
 
 
+def _customer_index_keys(customer: Any):
+    """Yield (index name, key) pairs under which a customer is indexed."""
+    if not isinstance(customer, dict):
+        return
+    if customer_id := customer.get("id"):
+        yield "customer_index_by_id", customer_id
+    if customer_email := customer.get("email"):
+        yield "customer_index_by_email", customer_email.lower()
+    if customer_phone := customer.get("phone"):
+        yield "customer_index_by_phone", customer_phone
+
+
+def _customer_name_lower(customer: Any) -> str:
+    if not isinstance(customer, dict):
+        return ""
+    return f"{customer.get('firstName', '')} {customer.get('lastName', '')}".strip().lower()
+
+
+def _index_customer(extracted: Dict[str, Any], customer: Any, position: int) -> None:
+    for index_name, key in _customer_index_keys(customer):
+        extracted.setdefault(index_name, {}).setdefault(key, position)
+    # Name list stays parallel to customers; a gap (state from before the list existed)
+    # leaves it short, and match_customer then ignores it
+    names = extracted.setdefault("customer_names_lower", [])
+    if position < len(names):
+        names[position] = _customer_name_lower(customer)
+    elif position == len(names):
+        names.append(_customer_name_lower(customer))
+
+
+def _unindex_customer(extracted: Dict[str, Any], customer: Any, position: int) -> None:
+    for index_name, key in _customer_index_keys(customer):
+        index = extracted.get(index_name, {})
+        if index.get(key) == position:
+            del index[key]
+
+
+def find_customer_position(extracted: Dict[str, Any], customer_id: str) -> Optional[int]:
+    """Position of customer_id in extracted["customers"] via the id index (linear scan fallback)."""
+    customers = extracted.get("customers", [])
+    index = extracted.get("customer_index_by_id")
+    if index is not None:
+        position = index.get(customer_id)
+        if position is None:
+            return None
+        if position < len(customers) and isinstance(customers[position], dict) and customers[position].get("id") == customer_id:
+            return position
+    # Index missing (state from before indexing) or stale - fall back to a scan
+    for position, customer in enumerate(customers):
+        if isinstance(customer, dict) and customer.get("id") == customer_id:
+            return position
+    return None
+
+
+def find_customer_by_contact(extracted: Dict[str, Any], email: Optional[str] = None, phone: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Find a stored customer by email (case-insensitive) or phone using the extracted indexes."""
+    customers = extracted.get("customers", [])
+    email_lower = email.lower() if email else None
+    by_email = extracted.get("customer_index_by_email")
+    by_phone = extracted.get("customer_index_by_phone")
+    if by_email is None or by_phone is None:
+        # Index missing (state from before indexing) - fall back to a scan
+        for customer in customers:
+            if isinstance(customer, dict) and (
+                (email_lower and (customer_email := customer.get("email")) and customer_email.lower() == email_lower) or
+                (phone and customer.get("phone") == phone)
+            ):
+                return customer
+        return None
+    for index, key in ((by_email, email_lower), (by_phone, phone)):
+        position = index.get(key) if key else None
+        if position is not None and position < len(customers):
+            return customers[position]
+    return None
+
+
+def _customer_pets(customer: Any) -> List[Dict[str, Any]]:
+    pets = customer.get("pets", []) if isinstance(customer, dict) else []
+    return pets if isinstance(pets, list) else []
+
+
+def add_customer_fields(extracted: Dict[str, Any], customers: List[Dict[str, Any]], customer: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold a customer just appended to customers into extract_customer_fields output.
+    
+    Same result as extract_customer_fields(customers), but only the new customer's
+    pets are processed instead of rescanning the whole list.
+    """
+    if not extracted:
+        return extract_customer_fields(customers)
+    extracted["customers"] = customers
+    if customers and customers[0] is customer:
+        extracted["customer_id"] = customer.get("id") if isinstance(customer, dict) else None
+    extracted.setdefault("existing_pets", []).extend(_customer_pets(customer))
+    _index_customer(extracted, customer, len(customers) - 1)
+    return extracted
+
+
+def replace_customer_fields(extracted: Dict[str, Any], customers: List[Dict[str, Any]], position: int, old_customer: Dict[str, Any], new_customer: Dict[str, Any]) -> Dict[str, Any]:
+    """Update extract_customer_fields output after customers[position] was replaced (old_customer -> new_customer)."""
+    if not extracted:
+        return extract_customer_fields(customers)
+    extracted["customers"] = customers
+    _unindex_customer(extracted, old_customer, position)
+    _index_customer(extracted, new_customer, position)
+    if customers and customers[0] is new_customer:
+        extracted["customer_id"] = new_customer.get("id")
+    old_pet_ids = {pet.get("id") for pet in _customer_pets(old_customer) if isinstance(pet, dict)}
+    existing_pets = [
+        pet for pet in extracted.get("existing_pets", [])
+        if not (isinstance(pet, dict) and pet.get("id") in old_pet_ids)
+    ]
+    existing_pets.extend(_customer_pets(new_customer))
+    extracted["existing_pets"] = existing_pets
+    return extracted
+
+
 def extract_booking_fields(booking_response: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Extract relevant fields from bookings response.
     
@@ -66,41 +357,136 @@ def extract_booking_fields(booking_response: List[Dict[str, Any]]) -> Dict[str,
         Dictionary with extracted fields:
         - booking_id: First booking ID if found
         - bookings: Full list of bookings
-        - customer_ids: Set of unique customer IDs
-        - pet_ids: Set of unique pet IDs from all bookings
+        - customer_ids: Unique customer IDs (list, first-seen order)
+        - pet_ids: Unique pet IDs from all bookings (list, first-seen order)
+        - booking_index_by_id: Positions in bookings keyed by booking id
+        - booking_positions_by_client: Positions in bookings keyed by clientId (list order)
     """
+    is_list = isinstance(booking_response, list)
     extracted = {
         "booking_id": None,
-        "bookings": booking_response if isinstance(booking_response, list) else [],
-        "customer_ids": set(),
-        "pet_ids": set()
+        "bookings": booking_response if is_list else [],
+        "customer_ids": [],
+        "pet_ids": [],
+        "booking_index_by_id": {},
+        "booking_positions_by_client": {},
     }
     
-    if isinstance(booking_response, list) and len(booking_response) > 0:
+    if is_list and booking_response:
         # Get first booking ID
         first_booking = booking_response[0]
-        if isinstance(first_booking, dict) and "id" in first_booking:
-            extracted["booking_id"] = first_booking["id"]
+        first_id = first_booking.get("id") if isinstance(first_booking, dict) else None
+        if first_id:
+            extracted["booking_id"] = first_id
         
-        # Extract customer IDs and pet IDs from all bookings
-        for booking in booking_response:
+        # Index bookings by ID and client; the client index keys double as the unique customer IDs
+        by_client = extracted["booking_positions_by_client"]
+        for position, booking in enumerate(booking_response):
             if isinstance(booking, dict):
-                if "clientId" in booking and booking["clientId"]:
-                    extracted["customer_ids"].add(booking["clientId"])
-                if "bookingPets" in booking:
-                    pets = booking.get("bookingPets", [])
-                    if isinstance(pets, list):
-                        for pet in pets:
-                            if isinstance(pet, dict) and "petId" in pet and pet["petId"]:
-                                extracted["pet_ids"].add(pet["petId"])
+                if booking.get("id"):
+                    extracted["booking_index_by_id"].setdefault(booking["id"], position)
+                if booking.get("clientId"):
+                    by_client.setdefault(booking["clientId"], []).append(position)
+        extracted["customer_ids"] = list(by_client)
+        
+        # Extract unique pet IDs from all bookings (built in one pass by itertools)
+        extracted["pet_ids"] = list(dict.fromkeys(itertools.chain.from_iterable(map(_booking_pet_ids, booking_response))))
+    
+    # Lists, not sets: extracted fields live in session state, which must stay JSON-serializable
+    return extracted
+
+
+def _extend_unique(extracted: Dict[str, Any], key: str, values: List[str]) -> None:
+    """Append values missing from the list extracted[key] (a set is only used locally for the check)."""
+    current = extracted.get(key)
+    if not isinstance(current, list):
+        current = list(current or ())
+        extracted[key] = current
+    seen = set(current)
+    for value in values:
+        if value not in seen:
+            seen.add(value)
+            current.append(value)
+
+
+def _booking_pet_ids(booking: Any) -> List[str]:
+    pets = booking.get("bookingPets", []) if isinstance(booking, dict) else []
+    if not isinstance(pets, list):
+        return []
+    return [pet["petId"] for pet in pets if isinstance(pet, dict) and pet.get("petId")]
+
+
+def add_booking_fields(extracted: Dict[str, Any], bookings: List[Dict[str, Any]], booking: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold a booking just appended to bookings into extract_booking_fields output.
     
-    # Convert sets to lists for JSON serialization
-    extracted["customer_ids"] = list(extracted["customer_ids"])
-    extracted["pet_ids"] = list(extracted["pet_ids"])
+    Same result as extract_booking_fields(bookings), but only the new booking's
+    client and pet IDs are processed instead of rescanning the whole list.
+    """
+    if not extracted:
+        return extract_booking_fields(bookings)
+    extracted["bookings"] = bookings
+    if bookings and bookings[0] is booking:
+        extracted["booking_id"] = booking.get("id") if isinstance(booking, dict) else None
+    client_id = booking.get("clientId") if isinstance(booking, dict) else None
+    if client_id:
+        _extend_unique(extracted, "customer_ids", [client_id])
+        # Only extend an existing client index; a missing one makes client_bookings scan
+        by_client = extracted.get("booking_positions_by_client")
+        if by_client is not None:
+            by_client.setdefault(client_id, []).append(len(bookings) - 1)
+    _extend_unique(extracted, "pet_ids", _booking_pet_ids(booking))
+    if isinstance(booking, dict) and booking.get("id"):
+        extracted.setdefault("booking_index_by_id", {}).setdefault(booking["id"], len(bookings) - 1)
+    return extracted
+
+
+def find_booking_position(extracted: Dict[str, Any], bookings: List[Dict[str, Any]], booking_id: str) -> Optional[int]:
+    """Position of booking_id in bookings via the extracted id index (linear scan fallback)."""
+    index = extracted.get("booking_index_by_id") if extracted else None
+    if index is not None:
+        position = index.get(booking_id)
+        if position is None:
+            return None
+        if position < len(bookings) and isinstance(bookings[position], dict) and bookings[position].get("id") == booking_id:
+            return position
+    # Index missing (state from before indexing) or stale - fall back to a scan
+    for position, booking in enumerate(bookings):
+        if isinstance(booking, dict) and booking.get("id") == booking_id:
+            return position
+    return None
+
+
+def replace_booking_fields(extracted: Dict[str, Any], bookings: List[Dict[str, Any]], old_booking: Dict[str, Any], new_booking: Dict[str, Any]) -> Dict[str, Any]:
+    """Update extract_booking_fields output after old_booking was replaced by new_booking in bookings.
     
+    The common update (same client and pets) touches no aggregate; otherwise the ID
+    aggregates are rebuilt since other bookings may share the old IDs.
+    """
+    if not extracted:
+        return extract_booking_fields(bookings)
+    extracted["bookings"] = bookings
+    same_client = isinstance(old_booking, dict) and isinstance(new_booking, dict) and \
+        old_booking.get("clientId") == new_booking.get("clientId")
+    if not same_client or set(_booking_pet_ids(old_booking)) != set(_booking_pet_ids(new_booking)):
+        rebuilt = extract_booking_fields(bookings)
+        extracted["customer_ids"] = rebuilt["customer_ids"]
+        extracted["pet_ids"] = rebuilt["pet_ids"]
+        extracted["booking_positions_by_client"] = rebuilt["booking_positions_by_client"]
     return extracted
 
 
+def client_bookings(extracted: Dict[str, Any], bookings: List[Dict[str, Any]], client_id: str) -> List[Dict[str, Any]]:
+    """Bookings of client_id in list order via the extracted client index (linear scan fallback)."""
+    index = extracted.get("booking_positions_by_client") if extracted else None
+    if index is not None:
+        positions = index.get(client_id, ())
+        matches = [bookings[p] for p in positions if p < len(bookings) and isinstance(bookings[p], dict)]
+        if len(matches) == len(positions) and all(b.get("clientId") == client_id for b in matches):
+            return matches
+    # Index missing (state from before indexing) or stale - fall back to a scan
+    return [b for b in bookings if isinstance(b, dict) and b.get("clientId") == client_id]
+
+
 def extract_service_fields(service_response: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Extract relevant fields from services response.
     
@@ -112,28 +498,85 @@ def extract_service_fields(service_response: List[Dict[str, Any]]) -> Dict[str,
         - service_id: First service ID if found
         - services: Full list of services
         - service_map: Map of service names to service IDs
+        - service_names_lower: Lowercased service names (fuzzy matching choices)
+        - service_names_to_id: Map of lowercased service names to service IDs
     """
+    is_list = isinstance(service_response, list)
     extracted = {
         "service_id": None,
-        "services": service_response if isinstance(service_response, list) else [],
-        "service_map": {}
+        "services": service_response if is_list else [],
+        "service_map": {},
+        "service_names_lower": [],
+        "service_names_to_id": {},
     }
     
-    if isinstance(service_response, list) and len(service_response) > 0:
+    if is_list and service_response:
         # Get first service ID
         first_service = service_response[0]
-        if isinstance(first_service, dict) and "id" in first_service:
-            extracted["service_id"] = first_service["id"]
+        first_id = first_service.get("id") if isinstance(first_service, dict) else None
+        if first_id:
+            extracted["service_id"] = first_id
         
         # Create map of service names to service IDs
         for service in service_response:
-            if isinstance(service, dict) and "id" in service and "name" in service:
-                service_name = service["name"]
-                service_id = service["id"]
+            if not isinstance(service, dict):
+                continue
+            service_id = service.get("id")
+            service_name = service.get("name")
+            if service_id and service_name:
                 extracted["service_map"][service_name] = service_id
+                service_name_lower = service_name.lower().strip()
+                if service_name_lower not in extracted["service_names_to_id"]:
+                    extracted["service_names_lower"].append(service_name_lower)
+                    extracted["service_names_to_id"][service_name_lower] = service_id
     
     return extracted
 
+
+def resolve_service_id(query: str, extracted: Dict[str, Any]) -> Optional[str]:
+    """Resolve a service name (possibly misspelled) to a service ID using extract_service_fields output.
+    
+    Names are lowercased once in extract_service_fields, so matching only lowercases the query.
+    Without rapidfuzz only exact (case-insensitive) names are resolved.
+    """
+    if not query or not extracted:
+        return None
+    names_to_id = extracted.get("service_names_to_id")
+    if names_to_id is None:
+        # State extracted before the lowercased index existed
+        names_to_id = {name.lower().strip(): service_id for name, service_id in (extracted.get("service_map") or {}).items()}
+    query_lower = query.lower().strip()
+    if query_lower in names_to_id:
+        return names_to_id[query_lower]
+    if HAS_FUZZY_MATCHING and names_to_id:
+        match = process.extractOne(
+            query_lower,
+            extracted.get("service_names_lower") or list(names_to_id),
+            scorer=fuzz.WRatio,
+            score_cutoff=80,
+        )
+        if match:
+            return names_to_id.get(match[0])
+    return None
+
+
+async def _get_customer_profile(tool_context: ToolContext, pet_professional_id: str) -> ToolResult:
+    """Fetch the professional's customers and store them in state (get_customer_profile tool body)."""
+    try:
+        # Make API call
+        result = await api_client.get_customer_profiles_by_pet_professionals_id(pet_professional_id)
+        
+        # Extract relevant fields
+        extracted = extract_customer_fields(result)
+        
+        # Store in session state if ToolContext is available
+        _store_tool_result(tool_context, "get_customer_profile", result, extracted)
+        
+        return _ok(result)
+    except Exception as e:
+        return _err(e)
+
+
 async def get_customer_profile(tool_context: ToolContext, pet_professional_id: str) -> str:
     """Get existing customers profiles by pet professionals id
 
@@ -176,33 +619,45 @@ async def get_customer_profile(tool_context: ToolContext, pet_professional_id: s
                 - imageUrl: URL to pet's photo (may be empty string)
                 - active: Boolean indicating if pet profile is active
     """
+    return _to_json(await _get_customer_profile(tool_context, pet_professional_id))
+
+
+async def _create_customer(tool_context: ToolContext, customer_data_json: str) -> ToolResult:
+    """Create a customer unless state already holds one with the same email/phone (create_customer tool body)."""
     try:
-        # Make API call
-        result = await api_client.get_customer_profiles_by_pet_professionals_id(pet_professional_id)
+        customer_data = _load_payload(customer_data_json)
         
-        # Extract relevant fields
-        extracted = extract_customer_fields(result)
+        # Check state for existing customer before creating
+        customer_state = _get_tool_state(tool_context, "get_customer_profile")
+        if customer_state is not None:
+            stored_extracted = customer_state.get("extracted", {})
+            # Check if customer with same email or phone already exists (indexed lookup)
+            email = customer_data.get("email")
+            phone = customer_data.get("phone")
+            if email or phone:
+                existing_customer = find_customer_by_contact(stored_extracted, email, phone)
+                if existing_customer is not None:
+                    # Customer already exists, return existing customer
+                    return _ok(existing_customer, from_cache=True)
         
-        # Store in session state if ToolContext is available
-        if tool_context and hasattr(tool_context, 'state'):
-            state = tool_context.state
-            if "tool_results" not in state:
-                state["tool_results"] = {}
-            state["tool_results"]["get_customer_profile"] = {
-                "full_response": result,
-                "extracted": extracted,
-                "timestamp": time.time()
-            }
+        # Create new customer
+        result = await api_client.create_customer(customer_data)
+        _invalidate_customer_cache(customer_data.get("professionalId"))
         
-        return json.dumps({
-            "success": True,
-            "data": result
-        })
+        # Update state with new customer
+        customer_state = _get_tool_state(tool_context, "get_customer_profile")
+        if customer_state is not None:
+            # Add new customer to cached list
+            extracted = customer_state["extracted"]
+            customers_list = extracted.get("customers", [])
+            if isinstance(customers_list, list):
+                customers_list.append(result)
+                # Fold the new customer into the extracted fields (no full re-extract)
+                customer_state["extracted"] = add_customer_fields(extracted, customers_list, result)
+        
+        return _ok(result)
     except Exception as e:
-        return json.dumps({
-            "success": False,
-            "error": str(e)
-        })
+        return _err(e)
 
 
 async def create_customer(tool_context: ToolContext, customer_data_json: str) -> str:
@@ -235,52 +690,43 @@ async def create_customer(tool_context: ToolContext, customer_data_json: str) ->
     Returns:
         JSON string with created customer information and success status
     """
+    return _to_json(await _create_customer(tool_context, customer_data_json))
+
+
+async def _create_pet_profiles(tool_context: ToolContext, customer_data_json: str) -> ToolResult:
+    """Add pets to a customer and patch the stored customer list (create_pet_profiles tool body)."""
     try:
-        customer_data = json.loads(customer_data_json)
+        customer_data = _load_payload(customer_data_json)
+        customer_id = customer_data.get("id")
         
-        # Check state for existing customer before creating
-        if tool_context and hasattr(tool_context, 'state'):
-            state = tool_context.state
-            if "tool_results" in state and "get_customer_profile" in state["tool_results"]:
-                stored_customers = state["tool_results"]["get_customer_profile"].get("extracted", {}).get("customers", [])
-                # Check if customer with same email or phone already exists
-                email = customer_data.get("email")
-                phone = customer_data.get("phone")
-                if email or phone:
-                    for existing_customer in stored_customers:
-                        if isinstance(existing_customer, dict):
-                            if (email and existing_customer.get("email") == email) or \
-                               (phone and existing_customer.get("phone") == phone):
-                                # Customer already exists, return existing customer
-                                return json.dumps({
-                                    "success": True,
-                                    "data": existing_customer,
-                                    "from_cache": True
-                                })
+        # Try to get customer_id from state if not provided
+        if not customer_id:
+            customer_state = _get_tool_state(tool_context, "get_customer_profile")
+            if customer_state is not None:
+                customer_id = customer_state.get("extracted", {}).get("customer_id")
+                if customer_id:
+                    customer_data["id"] = customer_id
         
-        # Create new customer
-        result = await api_client.create_customer(customer_data)
+        result = await api_client.create_pet_profiles(customer_data)
+        _invalidate_customer_cache(customer_data.get("professionalId"))
         
-        # Update state with new customer
-        if tool_context and hasattr(tool_context, 'state'):
-            state = tool_context.state
-            if "tool_results" in state and "get_customer_profile" in state["tool_results"]:
-                # Add new customer to cached list
-                customers_list = state["tool_results"]["get_customer_profile"]["extracted"].get("customers", [])
-                if isinstance(customers_list, list):
-                    customers_list.append(result)
-                    # Re-extract fields to update customer_id
-                    state["tool_results"]["get_customer_profile"]["extracted"] = extract_customer_fields(customers_list)
-        
-        return json.dumps({
-            "success": True,
-            "data": result
-        })
+        # Update state with new pets
+        customer_state = _get_tool_state(tool_context, "get_customer_profile")
+        if customer_state is not None:
+            # Update customer data in cache with new pets
+            extracted = customer_state["extracted"]
+            customers_list = extracted.get("customers", [])
+            # Find and update the customer in the list
+            position = find_customer_position(extracted, customer_id)
+            if position is not None:
+                customer = customers_list[position]
+                customers_list[position] = result
+                # Swap the customer's pets in the extracted fields (no full re-extract)
+                customer_state["extracted"] = replace_customer_fields(extracted, customers_list, position, customer, result)
+        
+        return _ok(result)
     except Exception as e:
-        return json.dumps({
-            "success": False,
-            "error": str(e)
-        })
+        return _err(e)
 
 
 async def create_pet_profiles(tool_context: ToolContext, customer_data_json: str) -> str:
@@ -310,44 +756,24 @@ async def create_pet_profiles(tool_context: ToolContext, customer_data_json: str
     Returns:
         JSON string with updated customer information and success status
     """
+    return _to_json(await _create_pet_profiles(tool_context, customer_data_json))
+
+
+async def _get_services(tool_context: ToolContext, professional_id: str) -> ToolResult:
+    """Fetch the professional's services and store them in state (get_services tool body)."""
     try:
-        customer_data = json.loads(customer_data_json)
-        customer_id = customer_data.get("id")
-        
-        # Try to get customer_id from state if not provided
-        if not customer_id and tool_context and hasattr(tool_context, 'state'):
-            state = tool_context.state
-            if "tool_results" in state and "get_customer_profile" in state["tool_results"]:
-                extracted = state["tool_results"]["get_customer_profile"].get("extracted", {})
-                customer_id = extracted.get("customer_id")
-                if customer_id:
-                    customer_data["id"] = customer_id
+        # Make API call (cached per professional for SERVICES_CACHE_TTL_SECONDS)
+        result = await _fetch_services(professional_id)
         
-        result = await api_client.create_pet_profiles(customer_data)
+        # Extract relevant fields
+        extracted = extract_service_fields(result)
         
-        # Update state with new pets
-        if tool_context and hasattr(tool_context, 'state'):
-            state = tool_context.state
-            if "tool_results" in state and "get_customer_profile" in state["tool_results"]:
-                # Update customer data in cache with new pets
-                customers_list = state["tool_results"]["get_customer_profile"]["extracted"].get("customers", [])
-                # Find and update the customer in the list
-                for i, customer in enumerate(customers_list):
-                    if isinstance(customer, dict) and customer.get("id") == customer_id:
-                        customers_list[i] = result
-                        break
-                # Re-extract fields
-                state["tool_results"]["get_customer_profile"]["extracted"] = extract_customer_fields(customers_list)
+        # Store in session state if ToolContext is available
+        _store_tool_result(tool_context, "get_services", result, extracted)
         
-        return json.dumps({
-            "success": True,
-            "data": result
-        })
+        return _ok(result)
     except Exception as e:
-        return json.dumps({
-            "success": False,
-            "error": str(e)
-        })
+        return _err(e)
 
 
 async def get_services(tool_context: ToolContext, professional_id: str) -> str:
@@ -405,33 +831,24 @@ async def get_services(tool_context: ToolContext, professional_id: str) -> str:
 
 
     """
+    return _to_json(await _get_services(tool_context, professional_id))
+
+
+async def _get_bookings(tool_context: ToolContext, professional_id: str) -> ToolResult:
+    """Fetch the professional's bookings and store them in state (get_bookings tool body)."""
     try:
         # Make API call
-        result = await api_client.get_services_by_professional_id(professional_id)
+        result = await api_client.get_bookings_by_professional_id(professional_id)
         
         # Extract relevant fields
-        extracted = extract_service_fields(result)
+        extracted = extract_booking_fields(result)
         
         # Store in session state if ToolContext is available
-        if tool_context and hasattr(tool_context, 'state'):
-            state = tool_context.state
-            if "tool_results" not in state:
-                state["tool_results"] = {}
-            state["tool_results"]["get_services"] = {
-                "full_response": result,
-                "extracted": extracted,
-                "timestamp": time.time()
-            }
+        _store_tool_result(tool_context, "get_bookings", result, extracted)
         
-        return json.dumps({
-            "success": True,
-            "data": result
-        })
+        return _ok(result)
     except Exception as e:
-        return json.dumps({
-            "success": False,
-            "error": str(e)
-        })
+        return _err(e)
 
 
 async def get_bookings(tool_context: ToolContext, professional_id: str) -> str:
@@ -472,33 +889,112 @@ async def get_bookings(tool_context: ToolContext, professional_id: str) -> str:
             - occurrenceNumber: Current occurrence number
             - allDay: Boolean indicating if booking is all-day
     """
+    return _to_json(await _get_bookings(tool_context, professional_id))
+
+
+# Read tools a booking may depend on; each stores its result in state["tool_results"][name]
+_PREFETCH_TOOLS = {
+    "get_customer_profile": _get_customer_profile,
+    "get_services": _get_services,
+}
+
+
+async def _prefetch_context(tool_context: ToolContext, professional_id: Optional[str], needs: set) -> None:
+    """Load the tool_results in needs that are missing from state, concurrently.
+
+    Independent backend reads are issued with asyncio.gather so their round-trips
+    overlap instead of adding up; new tools that need several reads should do the same.
+    """
+    state = getattr(tool_context, "state", None) if tool_context else None
+    if state is None or not professional_id:
+        return
+    tool_results = state.get("tool_results") or {}
+    missing = [name for name in needs if name in _PREFETCH_TOOLS and name not in tool_results]
+    if missing:
+        # The read tools report failures in their JSON result, so gather never raises here
+        await asyncio.gather(*(_PREFETCH_TOOLS[name](tool_context, professional_id) for name in missing))
+
+
+# Reads loaded at the start of a booking turn. get_customer_profile is left to
+# ensure_customer_exists: a prefetched customer list would bypass its cross-session cache
+_SESSION_PREFETCH = ("get_services",)
+
+
+async def prefetch_session_context(tool_context: ToolContext, professional_id: Optional[str]) -> None:
+    """Load the professional's services into state ahead of service_agent.
+
+    Run at the start of a booking turn so ensure_service_matched takes its state path
+    while customer_agent and pet_agent run, instead of waiting on its own backend read.
+    """
+    await _prefetch_context(tool_context, professional_id, set(_SESSION_PREFETCH))
+
+
+async def prefetch_session_context_callback(callback_context: Any) -> None:
+    """before_agent_callback running prefetch_session_context for the session's professional.
+
+    The professional is the session user (prompts pass user_id as professional_id).
+    """
+    await prefetch_session_context(callback_context, getattr(callback_context, "user_id", None))
+
+
+async def _create_booking(tool_context: ToolContext, booking_data_json: str) -> ToolResult:
+    """Create a booking, filling clientId/serviceId from state (create_booking tool body)."""
     try:
-        # Make API call
-        result = await api_client.get_bookings_by_professional_id(professional_id)
+        booking_data = _load_payload(booking_data_json)
         
-        # Extract relevant fields
-        extracted = extract_booking_fields(result)
+        # Load customer/service data missing from state in one concurrent round-trip
+        needs = set()
+        if not booking_data.get("clientId"):
+            needs.add("get_customer_profile")
+        if not booking_data.get("serviceId"):
+            needs.add("get_services")
+        await _prefetch_context(tool_context, booking_data.get("professionalId"), needs)
         
-        # Store in session state if ToolContext is available
-        if tool_context and hasattr(tool_context, 'state'):
-            state = tool_context.state
-            if "tool_results" not in state:
-                state["tool_results"] = {}
-            state["tool_results"]["get_bookings"] = {
-                "full_response": result,
-                "extracted": extracted,
-                "timestamp": time.time()
-            }
+        # Try to get missing data from state
+        tool_results = _get_tool_results(tool_context)
+        if tool_results:
+            # Get customer data from state
+            customer_state = tool_results.get("get_customer_profile")
+            if customer_state:
+                customer_id = customer_state.get("extracted", {}).get("customer_id")
+                if not booking_data.get("clientId") and customer_id:
+                    booking_data["clientId"] = customer_id
+            
+            # Get service data from state
+            services_state = tool_results.get("get_services")
+            if services_state:
+                services_extracted = services_state.get("extracted", {})
+                if not booking_data.get("serviceId"):
+                    # Try to match service by name or use first service
+                    service_map = services_extracted.get("service_map", {})
+                    if service_map:
+                        # Match by name if provided, otherwise use first
+                        service_id = resolve_service_id(booking_data.get("serviceName"), services_extracted) \
+                            or services_extracted.get("service_id")
+                        if service_id:
+                            booking_data["serviceId"] = service_id
         
-        return json.dumps({
-            "success": True,
-            "data": result
-        })
+        # Make API call
+        result = await api_client.create_booking(booking_data)
+        
+        # Update state with new booking (add to bookings cache)
+        tool_results = _get_tool_results(tool_context, create=True)
+        if tool_results is not None:
+            if "get_bookings" not in tool_results:
+                tool_results["get_bookings"] = {"full_response": [], "extracted": {}}
+            bookings_state = tool_results["get_bookings"]
+            
+            # Append new booking to cached bookings list
+            bookings_list = bookings_state["full_response"]
+            if isinstance(bookings_list, list):
+                bookings_list.append(result)
+                # Fold the new booking into the extracted fields (no full re-extract)
+                extracted = bookings_state.get("extracted", {})
+                bookings_state["extracted"] = add_booking_fields(extracted, bookings_list, result)
+        
+        return _ok(result)
     except Exception as e:
-        return json.dumps({
-            "success": False,
-            "error": str(e)
-        })
+        return _err(e)
 
 
 async def create_booking(tool_context: ToolContext, booking_data_json: str) -> str:
@@ -524,60 +1020,60 @@ async def create_booking(tool_context: ToolContext, booking_data_json: str) -> s
     Returns:
         JSON string with created booking information and success status
     """
+    return _to_json(await _create_booking(tool_context, booking_data_json))
+
+
+async def _update_booking(tool_context: ToolContext, booking_id: str, booking_data_json: str) -> ToolResult:
+    """Update a booking merged over the stored copy (update_booking tool body)."""
     try:
-        booking_data = json.loads(booking_data_json)
+        booking_data = _load_payload(booking_data_json)
         
         # Try to get missing data from state
-        if tool_context and hasattr(tool_context, 'state'):
-            state = tool_context.state
-            if "tool_results" in state:
-                tool_results = state["tool_results"]
-                
-                # Get customer data from state
-                if "get_customer_profile" in tool_results:
-                    customer_extracted = tool_results["get_customer_profile"].get("extracted", {})
-                    if not booking_data.get("clientId") and customer_extracted.get("customer_id"):
-                        booking_data["clientId"] = customer_extracted["customer_id"]
-                
-                # Get service data from state
-                if "get_services" in tool_results:
-                    services_extracted = tool_results["get_services"].get("extracted", {})
-                    if not booking_data.get("serviceId"):
-                        # Try to match service by name or use first service
-                        service_map = services_extracted.get("service_map", {})
-                        if service_map:
-                            # Could match by name if provided, otherwise use first
-                            first_service_id = services_extracted.get("service_id")
-                            if first_service_id:
-                                booking_data["serviceId"] = first_service_id
+        tool_results = _get_tool_results(tool_context)
+        if tool_results:
+            # Get existing booking from state if available
+            bookings_state = tool_results.get("get_bookings")
+            if bookings_state:
+                bookings_list = bookings_state.get("full_response", [])
+                if isinstance(bookings_list, list):
+                    position = find_booking_position(bookings_state.get("extracted", {}), bookings_list, booking_id)
+                    if position is not None:
+                        # Merge existing booking data with updates
+                        for key, value in bookings_list[position].items():
+                            if key not in booking_data or booking_data[key] is None:
+                                booking_data[key] = value
+            
+            # Get customer data from state if clientId missing
+            if not booking_data.get("clientId"):
+                customer_id = tool_results.get("get_customer_profile", {}).get("extracted", {}).get("customer_id")
+                if customer_id:
+                    booking_data["clientId"] = customer_id
+            
+            # Get service data from state if serviceId missing
+            if not booking_data.get("serviceId"):
+                service_id = tool_results.get("get_services", {}).get("extracted", {}).get("service_id")
+                if service_id:
+                    booking_data["serviceId"] = service_id
         
-        # Make API call
-        result = await api_client.create_booking(booking_data)
+        result = await api_client.update_booking(booking_id, booking_data)
         
-        # Update state with new booking (add to bookings cache)
-        if tool_context and hasattr(tool_context, 'state'):
-            state = tool_context.state
-            if "tool_results" not in state:
-                state["tool_results"] = {}
-            if "get_bookings" not in state["tool_results"]:
-                state["tool_results"]["get_bookings"] = {"full_response": [], "extracted": {}}
-            
-            # Append new booking to cached bookings list
-            bookings_list = state["tool_results"]["get_bookings"]["full_response"]
+        # Update state with updated booking
+        bookings_state = _get_tool_state(tool_context, "get_bookings")
+        if bookings_state is not None:
+            bookings_list = bookings_state["full_response"]
             if isinstance(bookings_list, list):
-                bookings_list.append(result)
-                # Re-extract fields
-                state["tool_results"]["get_bookings"]["extracted"] = extract_booking_fields(bookings_list)
-        
-        return json.dumps({
-            "success": True,
-            "data": result
-        })
+                # Update existing booking in cache
+                extracted = bookings_state.get("extracted", {})
+                position = find_booking_position(extracted, bookings_list, booking_id)
+                if position is not None:
+                    booking = bookings_list[position]
+                    bookings_list[position] = result
+                    # Patch the extracted fields for this booking only (no full re-extract)
+                    bookings_state["extracted"] = replace_booking_fields(extracted, bookings_list, booking, result)
+        
+        return _ok(result)
     except Exception as e:
-        return json.dumps({
-            "success": False,
-            "error": str(e)
-        })
+        return _err(e)
 
 
 async def update_booking(tool_context: ToolContext, booking_id: str, booking_data_json: str) -> str:
@@ -610,136 +1106,187 @@ async def update_booking(tool_context: ToolContext, booking_id: str, booking_dat
     Returns:
         JSON string with updated booking information and success status
     """
-    try:
-        booking_data = json.loads(booking_data_json)
-        
-        # Try to get missing data from state
-        if tool_context and hasattr(tool_context, 'state'):
-            state = tool_context.state
-            if "tool_results" in state:
-                tool_results = state["tool_results"]
-                
-                # Get existing booking from state if available
-                if "get_bookings" in tool_results:
-                    bookings_list = tool_results["get_bookings"].get("full_response", [])
-                    if isinstance(bookings_list, list):
-                        for booking in bookings_list:
-                            if isinstance(booking, dict) and booking.get("id") == booking_id:
-                                # Merge existing booking data with updates
-                                for key, value in booking.items():
-                                    if key not in booking_data or booking_data[key] is None:
-                                        booking_data[key] = value
-                                break
-                
-                # Get customer data from state if clientId missing
-                if not booking_data.get("clientId") and "get_customer_profile" in tool_results:
-                    customer_extracted = tool_results["get_customer_profile"].get("extracted", {})
-                    if customer_extracted.get("customer_id"):
-                        booking_data["clientId"] = customer_extracted["customer_id"]
-                
-                # Get service data from state if serviceId missing
-                if not booking_data.get("serviceId") and "get_services" in tool_results:
-                    services_extracted = tool_results["get_services"].get("extracted", {})
-                    if services_extracted.get("service_id"):
-                        booking_data["serviceId"] = services_extracted["service_id"]
-        
-        result = await api_client.update_booking(booking_id, booking_data)
-        
-        # Update state with updated booking
-        if tool_context and hasattr(tool_context, 'state'):
-            state = tool_context.state
-            if "tool_results" in state and "get_bookings" in state["tool_results"]:
-                bookings_list = state["tool_results"]["get_bookings"]["full_response"]
-                if isinstance(bookings_list, list):
-                    # Update existing booking in cache
-                    for i, booking in enumerate(bookings_list):
-                        if isinstance(booking, dict) and booking.get("id") == booking_id:
-                            bookings_list[i] = result
-                            break
-                    # Re-extract fields
-                    state["tool_results"]["get_bookings"]["extracted"] = extract_booking_fields(bookings_list)
-        
-        return json.dumps({
-            "success": True,
-            "data": result
-        })
-    except Exception as e:
-        return json.dumps({
-            "success": False,
-            "error": str(e)
-        })
+    return _to_json(await _update_booking(tool_context, booking_id, booking_data_json))
 
 
 # Helper functions for matching and formatting
-def match_customer(customers: List[Dict[str, Any]], email: Optional[str] = None, phone: Optional[str] = None, name: Optional[str] = None) -> Optional[Dict[str, Any]]:
-    """Match customer by email, phone, or name."""
+def match_customer(customers: List[Dict[str, Any]], email: Optional[str] = None, phone: Optional[str] = None, name: Optional[str] = None, extracted: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Match customer by email, phone, or name.
+    
+    Email and phone are unique identifiers, so they are looked up first (O(1) via the
+    extract_customer_fields indexes); names are only scanned when both miss.
+    
+    extracted: extract_customer_fields output for customers (e.g. from state); built
+               here when not given.
+    """
     if not customers:
         return None
+    if extracted is None or extracted.get("customers") is not customers:
+        extracted = extract_customer_fields(customers)
     
-    for customer in customers:
+    # Match by email, then phone
+    if email or phone:
+        matched = find_customer_by_contact(extracted, email, phone)
+        if matched is not None:
+            return matched
+    
+    if not name:
+        return None
+    name_lower = name.lower()
+    names_lower = extracted.get("customer_names_lower")
+    if names_lower is None or len(names_lower) != len(customers):
+        names_lower = None
+    
+    for position, customer in enumerate(customers):
         if not isinstance(customer, dict):
             continue
         
-        # Match by email
-        if email and customer.get("email") and customer.get("email").lower() == email.lower():
-            return customer
-        
-        # Match by phone
-        if phone and customer.get("phone") and customer.get("phone") == phone:
-            return customer
-        
         # Match by name
-        if name:
-            customer_name = f"{customer.get('firstName', '')} {customer.get('lastName', '')}".strip().lower()
-            if customer_name and name.lower() in customer_name or customer_name in name.lower():
-                return customer
+        customer_name = names_lower[position] if names_lower is not None else _customer_name_lower(customer)
+        if customer_name and (name_lower in customer_name or customer_name in name_lower):
+            return customer
     
     return None
 
 
-def match_pet(pets: List[Dict[str, Any]], pet_name: str) -> Optional[Dict[str, Any]]:
-    """Match pet by name with fuzzy matching for typos (case-insensitive)."""
+def pets_by_name_lower(pets: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Pets keyed by lowercased, stripped name, in list order (first pet wins for duplicate names; unnamed pets are skipped)."""
+    by_name = {}
+    for pet in pets:
+        if isinstance(pet, dict) and (name_lower := pet.get("name", "").lower().strip()):
+            by_name.setdefault(name_lower, pet)
+    return by_name
+
+
+def match_pet(pets: List[Dict[str, Any]], pet_name: str, by_name: Optional[Dict[str, Dict[str, Any]]] = None, choices: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """Match pet by name with fuzzy matching for typos (case-insensitive).
+    
+    by_name: Optional pets_by_name_lower(pets), so callers matching several names
+             against the same pets index them only once (see match_pets).
+    choices: Optional list(by_name), the fuzzy matching choices
+    """
     if not pets or not pet_name:
         return None
+    if by_name is None:
+        by_name = pets_by_name_lower(pets)
     
     pet_name_lower = pet_name.lower().strip()
     
     # First try exact match
-    for pet in pets:
-        if isinstance(pet, dict):
-            existing_name = pet.get("name", "").lower().strip()
-            if existing_name == pet_name_lower:
-                return pet
+    if (pet := by_name.get(pet_name_lower)) is not None:
+        return pet
     
     # If fuzzy matching available, try fuzzy match (handles typos)
-    if HAS_FUZZY_MATCHING:
-        best_match = None
-        best_score = 0
-        threshold = 85  # 85% similarity threshold for typos
-        
-        for pet in pets:
-            if isinstance(pet, dict):
-                existing_name = pet.get("name", "").lower().strip()
-                if existing_name:
-                    # Use ratio for overall similarity
-                    score = fuzz.ratio(pet_name_lower, existing_name)
-                    if score > best_score and score >= threshold:
-                        best_score = score
-                        best_match = pet
-        
-        if best_match:
-            return best_match
+    if HAS_FUZZY_MATCHING and by_name:
+        # Best ratio over all names in one extractOne call, 85% similarity threshold for typos
+        match = process.extractOne(pet_name_lower, choices if choices is not None else list(by_name), scorer=fuzz.ratio, score_cutoff=85)
+        if match:
+            return by_name[match[0]]
     
     # Fallback: partial match (substring)
-    for pet in pets:
-        if isinstance(pet, dict):
-            existing_name = pet.get("name", "").lower().strip()
-            if pet_name_lower in existing_name or existing_name in pet_name_lower:
-                return pet
+    for existing_name, pet in by_name.items():
+        if pet_name_lower in existing_name or existing_name in pet_name_lower:
+            return pet
     
     return None
 
 
+def match_pets(pets: List[Dict[str, Any]], pet_names: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Match several requested pet names against the same pets (requested name -> pet or None).
+    
+    The name index and fuzzy choices are built once for the batch, and a name
+    requested twice is matched once.
+    """
+    by_name = pets_by_name_lower(pets)
+    choices = list(by_name)
+    return {name: match_pet(pets, name, by_name, choices) for name in dict.fromkeys(pet_names) if name}
+
+
+# Keywords for semantic service matching - prioritized and more specific to avoid overlap
+# Higher priority keywords come first in each tuple
+_SERVICE_KEYWORDS = {
+    "pet sitting": (
+        "pet sitting", "pet sitter", "sitting", "overnight", "overnight care",
+        "watch", "watch my", "look after", "look after my",
+        "care for", "care for my", "pet care", "dog sitting", "cat sitting",
+        "babysit", "babysitting", "pet babysitting", "stay with", "stay with my",
+        "house sit", "house sitting", "pet house sitting"
+    ),
+    "dog walking": (
+        "dog walking", "dog walker", "walk", "walk my dog",
+        "take my dog for a walk", "dog walk", "take dog out", "walk the dog",
+        "daily walk", "regular walk"
+    ),
+    "grooming": (
+        "grooming", "groom", "bath", "bathe", "bathe my", "wash",
+        "wash my", "pet grooming", "dog grooming", "cat grooming", "nail trim",
+        "nail clipping", "haircut", "hair cut", "trim"
+    )
+}
+
+
+# Common words that don't help word-overlap matching
+_STOP_WORDS = frozenset({"pet", "my", "the", "a", "an", "for", "of", "with"})
+
+
+def _keyword_priority(keyword_list: Tuple[str, ...], idx: int) -> int:
+    # Higher priority keywords (earlier in list) get higher scores
+    return (len(keyword_list) - idx) * 10
+
+
+def _build_service_automaton():
+    """Aho-Corasick automaton over all service keywords; each value lists (service_type, priority_score)."""
+    automaton = ahocorasick.Automaton()
+    for service_type, keyword_list in _SERVICE_KEYWORDS.items():
+        for idx, kw in enumerate(keyword_list):
+            entries = automaton.get(kw, [])
+            entries.append((service_type, _keyword_priority(keyword_list, idx)))
+            automaton.add_word(kw, entries)
+    automaton.make_automaton()
+    return automaton
+
+
+_SERVICE_AUTOMATON = _build_service_automaton() if HAS_AHOCORASICK else None
+
+
+def _build_keyword_patterns():
+    """Per service type: a regex reporting the highest priority keyword starting at each position, and keyword -> priority score.
+
+    Alternatives are tried in list (priority) order and the lookahead makes matches
+    zero-width, so finditer visits every start position, overlaps included.
+    """
+    patterns = {}
+    for service_type, keyword_list in _SERVICE_KEYWORDS.items():
+        priorities = {}
+        for idx, kw in enumerate(keyword_list):
+            priorities.setdefault(kw, _keyword_priority(keyword_list, idx))
+        pattern = re.compile("(?=(" + "|".join(map(re.escape, keyword_list)) + "))")
+        patterns[service_type] = (pattern, priorities)
+    return patterns
+
+
+# Used when pyahocorasick is not installed
+_SERVICE_KEYWORD_PATTERNS = _build_keyword_patterns() if not HAS_AHOCORASICK else None
+
+
+def _request_keyword_hits(service_request_lower: str) -> Dict[str, int]:
+    """Best keyword priority score per service type found in the request (types without hits are omitted)."""
+    hits = {}
+    if _SERVICE_AUTOMATON is not None:
+        # One pass over the request reports every keyword occurrence
+        for _, entries in _SERVICE_AUTOMATON.iter(service_request_lower):
+            for service_type, priority_score in entries:
+                if priority_score > hits.get(service_type, 0):
+                    hits[service_type] = priority_score
+        return hits
+    for service_type, (pattern, priorities) in _SERVICE_KEYWORD_PATTERNS.items():
+        # One C-level scan per type instead of a substring search per keyword
+        best = max((priorities[m.group(1)] for m in pattern.finditer(service_request_lower)), default=0)
+        if best:
+            hits[service_type] = best
+    return hits
+
+
 def match_service_semantic(services: List[Dict[str, Any]], service_request: str) -> Optional[Dict[str, Any]]:
     """Semantically match service request to available services with improved logic to prevent false matches."""
     if not services or not service_request:
@@ -747,30 +1294,14 @@ def match_service_semantic(services: List[Dict[str, Any]], service_request: str)
     
     service_request_lower = service_request.lower().strip()
     
-    # Keywords for semantic matching - prioritized and more specific to avoid overlap
-    # Higher priority keywords come first in each list
-    keywords = {
-        "pet sitting": [
-            "pet sitting", "pet sitter", "sitting", "overnight", "overnight care",
-            "watch", "watch my", "look after", "look after my",
-            "care for", "care for my", "pet care", "dog sitting", "cat sitting",
-            "babysit", "babysitting", "pet babysitting", "stay with", "stay with my",
-            "house sit", "house sitting", "pet house sitting"
-        ],
-        "dog walking": [
-            "dog walking", "dog walker", "walk", "walk my dog",
-            "take my dog for a walk", "dog walk", "take dog out", "walk the dog",
-            "daily walk", "regular walk"
-        ],
-        "grooming": [
-            "grooming", "groom", "bath", "bathe", "bathe my", "wash",
-            "wash my", "pet grooming", "dog grooming", "cat grooming", "nail trim",
-            "nail clipping", "haircut", "hair cut", "trim"
-        ]
-    }
+    # Best keyword priority per service type, found once per request (not per service)
+    request_hits = _request_keyword_hits(service_request_lower)
+    # Meaningful request words for the word-overlap fallback, also computed once
+    request_words = set(service_request_lower.split()) - _STOP_WORDS
     
-    # Score services based on match quality (higher score = better match)
-    scored_services = []
+    # Score services based on match quality (higher score = better match), keeping the best so far
+    best_score = 0
+    best_service = None
     
     for service in services:
         if not isinstance(service, dict):
@@ -785,47 +1316,28 @@ def match_service_semantic(services: List[Dict[str, Any]], service_request: str)
         elif service_request_lower in service_name or service_name in service_request_lower:
             score = 900
         
-        # Priority 2: Semantic keyword match (check each service type)
-        for service_type, keyword_list in keywords.items():
-            # Check if request contains keywords for this service type
-            request_has_keywords = any(kw in service_request_lower for kw in keyword_list)
-            # Check if service name contains the service type
-            service_has_type = service_type in service_name
-            
-            if request_has_keywords and service_has_type:
-                # Find the highest priority keyword that matches
-                for idx, kw in enumerate(keyword_list):
-                    if kw in service_request_lower:
-                        # Higher priority keywords (earlier in list) get higher scores
-                        priority_score = (len(keyword_list) - idx) * 10
-                        score = max(score, 500 + priority_score)
-                        break
+        # Priority 2: Semantic keyword match (request has keywords for a type the service name contains)
+        for service_type, priority_score in request_hits.items():
+            if service_type in service_name:
+                score = max(score, 500 + priority_score)
         
         # Priority 3: Word overlap (lower priority, only if no better match)
-        if score < 500:
-            service_words = set(service_name.split())
-            request_words = set(service_request_lower.split())
-            common_words = service_words.intersection(request_words)
-            # Remove common stop words that don't help matching
-            stop_words = {"pet", "my", "the", "a", "an", "for", "of", "with"}
-            meaningful_common = common_words - stop_words
+        if score < 500 and request_words:
+            meaningful_common = request_words.intersection(service_name.split())
             if meaningful_common:
                 score = max(score, len(meaningful_common) * 10)
         
-        if score > 0:
-            scored_services.append((score, service))
-    
-    # Return the highest scoring service
-    if scored_services:
-        scored_services.sort(key=lambda x: x[0], reverse=True)
-        return scored_services[0][1]
+        # Strictly greater, so the first service wins ties
+        if score > best_score:
+            best_score = score
+            best_service = service
     
-    return None
+    return best_service
 
 
 def format_customer_result(customer: Dict[str, Any], status: str, source: str = "api") -> str:
     """Format customer data into agent output JSON."""
-    return json.dumps({
+    return dumps({
         "customer_id": customer.get("id"),
         "professional_id": customer.get("professionalId"),
         "status": status,
@@ -838,7 +1350,7 @@ def format_customer_result(customer: Dict[str, Any], status: str, source: str =
 
 def format_pet_result(customer_id: str, professional_id: str, pet_ids: List[str], pet_names: List[str], pet_species: List[str], status: str, source: str = "api", message: str = "") -> str:
     """Format pet data into agent output JSON."""
-    return json.dumps({
+    return dumps({
         "customer_id": customer_id,
         "professional_id": professional_id,
         "pet_ids": pet_ids,
@@ -852,7 +1364,7 @@ def format_pet_result(customer_id: str, professional_id: str, pet_ids: List[str]
 
 def format_service_result(service_id: str, professional_id: str, service_name: str, service_rate_id: Optional[str], service_rate: Optional[float], status: str, source: str = "api", message: str = "") -> str:
     """Format service data into agent output JSON."""
-    return json.dumps({
+    return dumps({
         "service_id": service_id,
         "professional_id": professional_id,
         "service_name": service_name,
@@ -865,6 +1377,43 @@ def format_service_result(service_id: str, professional_id: str, service_name: s
 
 
 # State-aware wrapper tools
+def _customer_cache_key(args: Dict[str, Any]) -> Optional[tuple]:
+    """Cross-session cache key: (professional_id, phone or email), or None to skip caching."""
+    contact = args.get("customer_phone") or args.get("customer_email")
+    if not args.get("professional_id") or not contact:
+        return None
+    return (args["professional_id"], contact)
+
+
+def _is_resolved_customer(result_json: str) -> bool:
+    try:
+        return loads(result_json).get("status") in ("found", "created")
+    except (ValueError, AttributeError):
+        return False
+
+
+def _as_cached_customer(result_json: str) -> str:
+    """Customer result as replayed to later sessions: the customer now exists, served from the cache."""
+    result = loads(result_json)
+    result.update(status="found", source="cache", message="Customer found")
+    return dumps(result)
+
+
+def _invalidate_customer_cache(professional_id: Optional[str]) -> None:
+    """Drop cached customer lookups after the professional's customer list changes."""
+    if professional_id:
+        ensure_customer_exists.cache.invalidate(lambda key: key[0] == professional_id)
+    else:
+        ensure_customer_exists.cache.invalidate()
+
+
+@cache_by(
+    _customer_cache_key,
+    ttl=CUSTOMER_CACHE_TTL_SECONDS,
+    state_keys=("get_customer_profile",),
+    cache_if=_is_resolved_customer,
+    cache_as=_as_cached_customer,
+)
 async def ensure_customer_exists(
     tool_context: ToolContext,
     professional_id: str,
@@ -883,29 +1432,40 @@ async def ensure_customer_exists(
     
     Returns:
         JSON string with formatted customer result ready for agent output
+
+    Resolved customers are also cached across sessions (keyed by professional and
+    phone/email), so a returning customer's new session restores the customer list
+    into state without calling the API (reported as status "found", source "cache").
+    ensure_pets_exist then finds existing pets in that restored state.
     """
-    state = tool_context.state if tool_context and hasattr(tool_context, 'state') else {}
+    state = _tool_state(tool_context)
+    if state is None:
+        state = {}
     
     # Check state for existing customer
-    if "tool_results" in state and "get_customer_profile" in state["tool_results"]:
-        customers = state["tool_results"]["get_customer_profile"].get("extracted", {}).get("customers", [])
-        matched = match_customer(customers, customer_email, customer_phone, customer_name)
+    customer_index = _get_customer_index(state)
+    if customer_index.customers:
+        matched = match_customer(customer_index.customers, customer_email, customer_phone, customer_name, customer_index.extracted)
         if matched:
             return format_customer_result(matched, "found", "state")
     
     # Not in state - check API
-    result_json = await get_customer_profile(tool_context, professional_id)
-    result = json.loads(result_json)
+    result = await _get_customer_profile(tool_context, professional_id)
     
     if result.get("success") and result.get("data"):
-        customers = result["data"]
-        matched = match_customer(customers, customer_email, customer_phone, customer_name)
+        # Match against the list get_customer_profile just stored (its indexes are already built)
+        customer_index = _get_customer_index(_tool_state(tool_context))
+        if customer_index.extracted is not None:
+            customers = customer_index.customers
+        else:
+            customers = result["data"]
+        matched = match_customer(customers, customer_email, customer_phone, customer_name, customer_index.extracted)
         if matched:
             return format_customer_result(matched, "found", "api")
     
     # Not found - create
     if not customer_name and not customer_email and not customer_phone:
-        return json.dumps({
+        return dumps({
             "customer_id": None,
             "professional_id": professional_id,
             "status": "insufficient_data",
@@ -925,13 +1485,12 @@ async def ensure_customer_exists(
         "professionalId": professional_id
     }
     
-    create_result = await create_customer(tool_context, json.dumps(customer_data))
-    create_data = json.loads(create_result)
+    create_data = await _create_customer(tool_context, customer_data)
     
     if create_data.get("success") and create_data.get("data"):
         return format_customer_result(create_data["data"], "created", "api")
     
-    return json.dumps({
+    return dumps({
         "customer_id": None,
         "professional_id": professional_id,
         "status": "error",
@@ -956,29 +1515,22 @@ async def ensure_pets_exist(
         JSON string with formatted pet result ready for agent output
     """
     try:
-        pets_data = json.loads(pets_info) if isinstance(pets_info, str) else pets_info
+        pets_data = loads(pets_info) if isinstance(pets_info, str) else pets_info
         if not isinstance(pets_data, list):
             pets_data = [pets_data]
         
-        state = tool_context.state if tool_context and hasattr(tool_context, 'state') else {}
+        state = _tool_state(tool_context)
+        if state is None:
+            state = {}
         
         # Get customer_id from state
-        customer_id = None
-        professional_id = None
-        existing_pets = []
-        
-        if "tool_results" in state and "get_customer_profile" in state["tool_results"]:
-            customer_extracted = state["tool_results"]["get_customer_profile"].get("extracted", {})
-            customer_id = customer_extracted.get("customer_id")
-            customers = customer_extracted.get("customers", [])
-            if customers and isinstance(customers, list) and len(customers) > 0:
-                first_customer = customers[0]
-                if isinstance(first_customer, dict):
-                    professional_id = first_customer.get("professionalId")
-                    existing_pets = first_customer.get("pets", [])
+        customer_index = _get_customer_index(state)
+        customer_id = customer_index.customer_id
+        professional_id = customer_index.professional_id
+        existing_pets = customer_index.pets
         
         if not customer_id:
-            return json.dumps({
+            return dumps({
                 "customer_id": None,
                 "professional_id": professional_id,
                 "pet_ids": [],
@@ -990,6 +1542,7 @@ async def ensure_pets_exist(
             })
         
         # Match existing pets and determine what to create/update
+        existing_matches = match_pets(existing_pets, [p.get("name") for p in pets_data if isinstance(p, dict)])
         pets_to_create = []
         pets_to_update = []
         matched_pet_ids = []
@@ -1005,7 +1558,7 @@ async def ensure_pets_exist(
                 continue
             
             # Check if pet already exists
-            existing_pet = match_pet(existing_pets, pet_name)
+            existing_pet = existing_matches.get(pet_name)
             
             if existing_pet:
                 # Pet exists - check if update needed
@@ -1047,8 +1600,7 @@ async def ensure_pets_exist(
                 "pets": all_pets
             }
             
-            result_json = await create_pet_profiles(tool_context, json.dumps(customer_data))
-            result = json.loads(result_json)
+            result = await _create_pet_profiles(tool_context, customer_data)
             
             if result.get("success") and result.get("data"):
                 # Extract pet IDs from result
@@ -1057,16 +1609,21 @@ async def ensure_pets_exist(
                 final_pet_names = []
                 final_pet_species = []
                 
+                # Index updated pets by name once (first pet wins, as the old nested scan did)
+                updated_by_name = {}
+                for updated_pet in updated_pets:
+                    if isinstance(updated_pet, dict) and updated_pet.get("name"):
+                        updated_by_name.setdefault(updated_pet["name"], updated_pet)
+                
                 for pet_info in pets_data:
                     pet_name = pet_info.get("name")
                     if pet_name:
                         # Find in updated pets
-                        for updated_pet in updated_pets:
-                            if isinstance(updated_pet, dict) and updated_pet.get("name") == pet_name:
-                                final_pet_ids.append(updated_pet.get("id"))
-                                final_pet_names.append(pet_name)
-                                final_pet_species.append(updated_pet.get("species", pet_info.get("species", "")))
-                                break
+                        updated_pet = updated_by_name.get(pet_name)
+                        if updated_pet is not None:
+                            final_pet_ids.append(updated_pet.get("id"))
+                            final_pet_names.append(pet_name)
+                            final_pet_species.append(updated_pet.get("species", pet_info.get("species", "")))
                 
                 # Combine with matched pets
                 final_pet_ids = matched_pet_ids + final_pet_ids
@@ -1089,7 +1646,7 @@ async def ensure_pets_exist(
         )
         
     except Exception as e:
-        return json.dumps({
+        return dumps({
             "customer_id": None,
             "professional_id": None,
             "pet_ids": [],
@@ -1101,44 +1658,37 @@ async def ensure_pets_exist(
         })
 
 
-async def match_service(
+async def _match_service(
     tool_context: ToolContext,
     professional_id: str,
     service_request: str
-) -> str:
-    """Match service request to available services using semantic matching.
-    
-    Args:
-        tool_context: ToolContext providing access to session state
-        professional_id: ID of the pet professional
-        service_request: Service type requested (e.g., "pet sitting", "dog walking")
-    
-    Returns:
-        JSON string with matched service information
-    """
-    state = tool_context.state if tool_context and hasattr(tool_context, 'state') else {}
+) -> Dict[str, Any]:
+    """match_service tool body; returns the result dict (encoded only by the public tool)."""
+    state = _tool_state(tool_context)
+    if state is None:
+        state = {}
     
     # Check state first
     services = None
-    if "tool_results" in state and "get_services" in state["tool_results"]:
-        services = state["tool_results"]["get_services"].get("full_response", [])
+    services_state = state.get("tool_results", {}).get("get_services")
+    if services_state:
+        services = services_state.get("full_response", [])
     
     # If not in state, fetch from API
     if not services:
-        result_json = await get_services(tool_context, professional_id)
-        result = json.loads(result_json)
+        result = await _get_services(tool_context, professional_id)
         if result.get("success"):
             services = result.get("data", [])
     
     if not services:
-        return json.dumps({
+        return {
             "matched_service_id": None,
             "service_name": None,
             "service_rate_id": None,
             "service_rate": None,
             "available_services": [],
             "message": "No services available"
-        })
+        }
     
     # Perform semantic matching
     matched = match_service_semantic(services, service_request)
@@ -1148,32 +1698,60 @@ async def match_service(
         service_rate = matched.get("amount")
         service_rate_id = None
         
-        if "serviceRate" in matched and isinstance(matched["serviceRate"], dict):
-            service_rate_obj = matched["serviceRate"]
+        service_rate_obj = matched.get("serviceRate")
+        if isinstance(service_rate_obj, dict):
             # Extract service rate ID (required for booking creation)
             service_rate_id = service_rate_obj.get("id")
             # Extract amount if not already found
             if service_rate is None:
                 service_rate = service_rate_obj.get("amount")
         
-        return json.dumps({
+        return {
             "matched_service_id": matched.get("id"),
             "service_name": matched.get("name"),
             "service_rate_id": service_rate_id,
             "service_rate": service_rate,
             "available_services": [s.get("name") for s in services if isinstance(s, dict) and s.get("name")],
             "message": f"Matched service: {matched.get('name')}"
-        })
+        }
     
     # No match found
-    return json.dumps({
+    return {
         "matched_service_id": None,
         "service_name": None,
         "service_rate_id": None,
         "service_rate": None,
         "available_services": [s.get("name") for s in services if isinstance(s, dict) and s.get("name")],
         "message": f"No matching service found for: {service_request}"
-    })
+    }
+
+
+async def match_service(
+    tool_context: ToolContext,
+    professional_id: str,
+    service_request: str
+) -> str:
+    """Match service request to available services using semantic matching.
+    
+    Args:
+        tool_context: ToolContext providing access to session state
+        professional_id: ID of the pet professional
+        service_request: Service type requested (e.g., "pet sitting", "dog walking")
+    
+    Returns:
+        JSON string with matched service information
+    """
+    return dumps(await _match_service(tool_context, professional_id, service_request))
+
+
+def _normalize_service_request(service_request: Optional[str]) -> str:
+    """Case- and whitespace-insensitive form of a service request ("Dog  Walking " -> "dog walking")."""
+    return " ".join(service_request.lower().split()) if service_request else ""
+
+
+def _service_match_key(professional_id: str, service_request: str) -> str:
+    # String key so the per-session match cache stays JSON-serializable state
+    return f"{professional_id}|{_normalize_service_request(service_request)}"
 
 
 async def ensure_service_matched(
@@ -1192,7 +1770,9 @@ async def ensure_service_matched(
         JSON string with formatted service result ready for agent output
     """
     try:
-        state = tool_context.state if tool_context and hasattr(tool_context, 'state') else {}
+        state = _tool_state(tool_context)
+        if state is None:
+            state = {}
         
         # Check state first for existing service match
         service_id = None
@@ -1201,9 +1781,16 @@ async def ensure_service_matched(
         service_rate = None
         source = "state"
         
-        if "tool_results" in state and "service_result" in state["tool_results"]:
-            service_extracted = state["tool_results"]["service_result"].get("extracted", {})
-            if service_extracted.get("service_id") and service_extracted.get("service_request") == service_request:
+        # Earlier matches in this session are cached by (professional, normalized request);
+        # the last match also counts if its request normalizes the same
+        match_key = _service_match_key(professional_id, service_request)
+        service_state = state.get("tool_results", {}).get("service_result")
+        if service_state:
+            service_extracted = service_state.get("_cache", {}).get(match_key) or service_state.get("extracted", {})
+            if service_extracted.get("service_id") and \
+                    _normalize_service_request(service_extracted.get("service_request")) == _normalize_service_request(service_request):
+                # The cached match becomes the current one (ensure_booking_exists reads "extracted")
+                service_state["extracted"] = service_extracted
                 service_id = service_extracted.get("service_id")
                 service_name = service_extracted.get("service_name")
                 service_rate_id = service_extracted.get("service_rate_id")
@@ -1221,8 +1808,7 @@ async def ensure_service_matched(
         
         # If not in state, match service
         source = "api"
-        match_result_json = await match_service(tool_context, professional_id, service_request)
-        match_result = json.loads(match_result_json)
+        match_result = await _match_service(tool_context, professional_id, service_request)
         
         service_id = match_result.get("matched_service_id")
         service_name = match_result.get("service_name")
@@ -1255,19 +1841,20 @@ async def ensure_service_matched(
             )
         
         # Store in state
-        if tool_context and hasattr(tool_context, 'state'):
-            state = tool_context.state
-            if "tool_results" not in state:
-                state["tool_results"] = {}
-            state["tool_results"]["service_result"] = {
-                "extracted": {
-                    "service_id": service_id,
-                    "service_name": service_name,
-                    "service_rate_id": service_rate_id,
-                    "service_rate": service_rate,
-                    "service_request": service_request
-                },
-                "timestamp": time.time()
+        tool_results = _get_tool_results(tool_context, create=True)
+        if tool_results is not None:
+            service_extracted = {
+                "service_id": service_id,
+                "service_name": service_name,
+                "service_rate_id": service_rate_id,
+                "service_rate": service_rate,
+                "service_request": service_request
+            }
+            match_cache = (tool_results.get("service_result") or {}).get("_cache", {})
+            match_cache[match_key] = service_extracted
+            tool_results["service_result"] = {
+                "extracted": service_extracted,
+                "_cache": match_cache
             }
         
         return format_service_result(
@@ -1294,6 +1881,59 @@ async def ensure_service_matched(
         )
 
 
+# Every ensure_booking_exists result has these keys (in this order); _booking_response fills in the rest
+_BOOKING_RESPONSE_TEMPLATE = {
+    "customer_id": None,
+    "professional_id": None,
+    "pet_ids": [],
+    "matched_service_id": None,
+    "service_name": None,
+    "service_rate_id": None,
+    "service_rate": None,
+    "start_date": None,
+    "end_date": None,
+    "start_time": None,
+    "end_time": None,
+    "booking_id_from_history": None,
+    "existing_booking_found": "not_found",
+    "existing_booking_id": None,
+    "action_taken": "error",
+    "booking_id": None,
+    "status": "error",
+    "source": "api",
+    "message": "",
+}
+
+
+def _booking_response(**fields: Any) -> str:
+    """Encode an ensure_booking_exists result: the template defaults overridden by fields."""
+    response = _BOOKING_RESPONSE_TEMPLATE.copy()
+    response.update(fields)
+    return dumps(response)
+
+
+# Fallback date-phrase parsing in ensure_booking_exists: today's date and "8 AM" / "6 pm" times
+_CURRENT_DATE = datetime.strptime(CURRENT_DATE, "%Y-%m-%d")
+_AMPM_RE = re.compile(r'(\d+)\s*(AM|PM)', re.IGNORECASE)
+
+
+def _to_24h(match: re.Match) -> int:
+    """24-hour clock hour for an _AMPM_RE match ("12 AM" -> 0, "12 PM" -> 12, "6 PM" -> 18)."""
+    hour = int(match.group(1))
+    am_pm = match.group(2).upper()
+    if am_pm == "PM" and hour != 12:
+        hour += 12
+    elif am_pm == "AM" and hour == 12:
+        hour = 0
+    return hour
+
+
+# "next weekend": the coming Saturday (a week out if today is Saturday) and the Sunday after it
+_NEXT_SATURDAY = _CURRENT_DATE + timedelta(days=(5 - _CURRENT_DATE.weekday()) % 7 or 7)
+_NEXT_SATURDAY_STR = _NEXT_SATURDAY.strftime("%Y-%m-%d")
+_NEXT_SUNDAY_STR = (_NEXT_SATURDAY + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
 async def ensure_booking_exists(
     tool_context: ToolContext,
     professional_id: str,
@@ -1320,51 +1960,24 @@ async def ensure_booking_exists(
         JSON string with formatted booking result ready for agent output
     """
     try:
-        state = tool_context.state if tool_context and hasattr(tool_context, 'state') else {}
+        state = _tool_state(tool_context)
+        if state is None:
+            state = {}
         
         # Get customer_id and pet_ids from state
-        customer_id = None
-        pet_ids = []
-        professional_id_from_state = professional_id
-        
-        if "tool_results" in state:
-            tool_results = state["tool_results"]
-            
-            # Get customer_id
-            if "get_customer_profile" in tool_results:
-                customer_extracted = tool_results["get_customer_profile"].get("extracted", {})
-                customer_id = customer_extracted.get("customer_id")
-                customers = customer_extracted.get("customers", [])
-                if customers and isinstance(customers, list) and len(customers) > 0:
-                    first_customer = customers[0]
-                    if isinstance(first_customer, dict):
-                        professional_id_from_state = first_customer.get("professionalId", professional_id)
-                        # Get pets from customer
-                        pets = first_customer.get("pets", [])
-                        pet_ids = [p.get("id") for p in pets if isinstance(p, dict) and p.get("id")]
+        customer_index = _get_customer_index(state)
+        customer_id = customer_index.customer_id
+        pet_ids = customer_index.pet_ids
+        professional_id_from_state = customer_index.professional_id or professional_id
         
         if not customer_id or not pet_ids:
-            return json.dumps({
-                "customer_id": customer_id,
-                "professional_id": professional_id_from_state,
-                "pet_ids": pet_ids,
-                "matched_service_id": None,
-                "service_name": None,
-                "service_rate_id": None,
-                "service_rate": None,
-                "start_date": None,
-                "end_date": None,
-                "start_time": None,
-                "end_time": None,
-                "booking_id_from_history": None,
-                "existing_booking_found": "not_found",
-                "existing_booking_id": None,
-                "action_taken": "error",
-                "booking_id": None,
-                "status": "insufficient_data",
-                "source": "api",
-                "message": "Customer ID or pet IDs not found in state. Ensure customer_agent and pet_agent run first."
-            })
+            return _booking_response(
+                customer_id=customer_id,
+                professional_id=professional_id_from_state,
+                pet_ids=pet_ids,
+                status="insufficient_data",
+                message="Customer ID or pet IDs not found in state. Ensure customer_agent and pet_agent run first."
+            )
         
         # Get service_id and service_rate_id from state (from service_agent)
         matched_service_id = None
@@ -1372,58 +1985,34 @@ async def ensure_booking_exists(
         service_rate_id = None
         service_rate = None
         
-        if "tool_results" in state and "service_result" in state["tool_results"]:
-            service_extracted = state["tool_results"]["service_result"].get("extracted", {})
+        service_state = state.get("tool_results", {}).get("service_result")
+        if service_state:
+            service_extracted = service_state.get("extracted", {})
             matched_service_id = service_extracted.get("service_id")
             service_name = service_extracted.get("service_name")
             service_rate_id = service_extracted.get("service_rate_id")
             service_rate = service_extracted.get("service_rate")
         
         if not matched_service_id:
-            return json.dumps({
-                "customer_id": customer_id,
-                "professional_id": professional_id_from_state,
-                "pet_ids": pet_ids,
-                "matched_service_id": None,
-                "service_name": None,
-                "service_rate_id": None,
-                "service_rate": None,
-                "start_date": None,
-                "end_date": None,
-                "start_time": None,
-                "end_time": None,
-                "booking_id_from_history": None,
-                "existing_booking_found": "not_found",
-                "existing_booking_id": None,
-                "action_taken": "error",
-                "booking_id": None,
-                "status": "insufficient_data",
-                "source": "api",
-                "message": "Service ID not found in state. Ensure service_agent runs before booking_creation_agent."
-            })
+            return _booking_response(
+                customer_id=customer_id,
+                professional_id=professional_id_from_state,
+                pet_ids=pet_ids,
+                status="insufficient_data",
+                message="Service ID not found in state. Ensure service_agent runs before booking_creation_agent."
+            )
         
         if not service_rate_id:
-            return json.dumps({
-                "customer_id": customer_id,
-                "professional_id": professional_id_from_state,
-                "pet_ids": pet_ids,
-                "matched_service_id": matched_service_id,
-                "service_name": service_name,
-                "service_rate_id": None,
-                "service_rate": service_rate,
-                "start_date": None,
-                "end_date": None,
-                "start_time": None,
-                "end_time": None,
-                "booking_id_from_history": None,
-                "existing_booking_found": "not_found",
-                "existing_booking_id": None,
-                "action_taken": "error",
-                "booking_id": None,
-                "status": "rate_missing",
-                "source": "api",
-                "message": f"Service '{service_name}' matched but service rate ID is missing. Service rate must be configured before creating booking."
-            })
+            return _booking_response(
+                customer_id=customer_id,
+                professional_id=professional_id_from_state,
+                pet_ids=pet_ids,
+                matched_service_id=matched_service_id,
+                service_name=service_name,
+                service_rate=service_rate,
+                status="rate_missing",
+                message=f"Service '{service_name}' matched but service rate ID is missing. Service rate must be configured before creating booking."
+            )
         
         # Get calculated dates from state (from date_calculation_agent in booking_sequential_agent)
         calculated_start_date = start_date
@@ -1432,38 +2021,19 @@ async def ensure_booking_exists(
         calculated_end_time = end_time
         
         # Check state for date_calculation_agent results
-        if "tool_results" in state:
-            tool_results = state["tool_results"]
-            # Look for date calculation results from date_calculation_agent output
-            # The date_calculation_agent outputs via output_key="date_result"
-            # Check conversation history or state for date_result
-            if "date_result" in tool_results:
-                date_result = tool_results["date_result"]
-                if isinstance(date_result, dict):
-                    calculated_start_date = date_result.get("start_date") or calculated_start_date
-                    calculated_end_date = date_result.get("end_date") or calculated_end_date
-                    # Handle times - check for None, empty string, or "null" string
-                    start_time_val = date_result.get("start_time")
-                    end_time_val = date_result.get("end_time")
-                    if start_time_val and start_time_val not in [None, "", "null", "None"]:
-                        calculated_start_time = start_time_val
-                    if end_time_val and end_time_val not in [None, "", "null", "None"]:
-                        calculated_end_time = end_time_val
-                elif isinstance(date_result, str):
-                    # Try to parse JSON string
-                    try:
-                        date_data = json.loads(date_result)
-                        calculated_start_date = date_data.get("start_date") or calculated_start_date
-                        calculated_end_date = date_data.get("end_date") or calculated_end_date
-                        # Handle times - check for None, empty string, or "null" string
-                        start_time_val = date_data.get("start_time")
-                        end_time_val = date_data.get("end_time")
-                        if start_time_val and start_time_val not in [None, "", "null", "None"]:
-                            calculated_start_time = start_time_val
-                        if end_time_val and end_time_val not in [None, "", "null", "None"]:
-                            calculated_end_time = end_time_val
-                    except:
-                        pass
+        # The date_calculation_agent outputs via output_key="date_result" (stored as a parsed
+        # dict by its after_agent_callback); tool_results["date_result"] is kept as an override
+        date_result = get_state(state.get("tool_results", {}), "date_result") or get_state(state, "date_result")
+        if date_result:
+            calculated_start_date = date_result.get("start_date") or calculated_start_date
+            calculated_end_date = date_result.get("end_date") or calculated_end_date
+            # Handle times - check for None, empty string, or "null" string
+            start_time_val = date_result.get("start_time")
+            end_time_val = date_result.get("end_time")
+            if start_time_val and start_time_val not in [None, "", "null", "None"]:
+                calculated_start_time = start_time_val
+            if end_time_val and end_time_val not in [None, "", "null", "None"]:
+                calculated_end_time = end_time_val
         
         # If dates are provided but times are not specified after extracting from state, set to cover entire day
         if calculated_start_date and calculated_end_date:
@@ -1476,53 +2046,30 @@ async def ensure_booking_exists(
         if not calculated_start_date and date_phrase:
             # Try basic parsing for common patterns
             try:
-                from datetime import datetime, timedelta
-                import re
-                
-                # Get current date from config
-                from ..config import CURRENT_DATE
-                current = datetime.strptime(CURRENT_DATE, "%Y-%m-%d")
-                
                 # Simple parsing for "next weekend", "next Saturday", etc.
                 date_phrase_lower = date_phrase.lower()
                 
                 # Parse "next weekend" or "next Saturday to Sunday"
                 if "next weekend" in date_phrase_lower or ("next saturday" in date_phrase_lower and "sunday" in date_phrase_lower):
-                    # Find next Saturday
-                    days_until_saturday = (5 - current.weekday()) % 7
-                    if days_until_saturday == 0:
-                        days_until_saturday = 7  # If today is Saturday, get next Saturday
-                    next_saturday = current + timedelta(days=days_until_saturday)
-                    next_sunday = next_saturday + timedelta(days=1)
-                    calculated_start_date = next_saturday.strftime("%Y-%m-%d")
-                    calculated_end_date = next_sunday.strftime("%Y-%m-%d")
+                    calculated_start_date = _NEXT_SATURDAY_STR
+                    calculated_end_date = _NEXT_SUNDAY_STR
                     
                     # Parse times if mentioned - look for "8 AM" and "6 PM" patterns
-                    time_matches = re.findall(r'(\d+)\s*(AM|PM)', date_phrase, re.IGNORECASE)
-                    if len(time_matches) >= 1:
-                        hour = int(time_matches[0][0])
-                        am_pm = time_matches[0][1].upper()
-                        if am_pm == "PM" and hour != 12:
-                            hour += 12
-                        elif am_pm == "AM" and hour == 12:
-                            hour = 0
-                        calculated_start_time = f"{hour:02d}:00"
-                    
-                    if len(time_matches) >= 2:
-                        hour = int(time_matches[1][0])
-                        am_pm = time_matches[1][1].upper()
-                        if am_pm == "PM" and hour != 12:
-                            hour += 12
-                        elif am_pm == "AM" and hour == 12:
-                            hour = 0
-                        calculated_end_time = f"{hour:02d}:00"
+                    # (only the first two are used, so the scan stops there)
+                    time_matches = _AMPM_RE.finditer(date_phrase)
+                    first_time = next(time_matches, None)
+                    if first_time is not None:
+                        calculated_start_time = f"{_to_24h(first_time):02d}:00"
+                        second_time = next(time_matches, None)
+                        if second_time is not None:
+                            calculated_end_time = f"{_to_24h(second_time):02d}:00"
                     
                     # If dates are provided but times are not specified, set to cover entire day
                     if calculated_start_date and calculated_end_date and not calculated_start_time and not calculated_end_time:
                         calculated_start_time = "00:00"
                         calculated_end_time = "23:59"
-            except Exception as e:
-                # If parsing fails, dates will remain None and we'll use placeholders
+            except (ValueError, AttributeError):
+                # If parsing fails (e.g. a non-string date_phrase), dates will remain None and we'll use placeholders
                 pass
         
         # Use calculated dates or fallback to placeholders
@@ -1548,74 +2095,60 @@ async def ensure_booking_exists(
         
         # Check state for existing booking
         existing_booking_id = None
-        existing_booking_found = "not_found"
+        existing_booking = None
         
-        if "tool_results" in state and "get_bookings" in state["tool_results"]:
-            bookings = state["tool_results"]["get_bookings"].get("full_response", [])
+        bookings_state = state.get("tool_results", {}).get("get_bookings")
+        if bookings_state:
+            bookings = bookings_state.get("full_response", [])
             if isinstance(bookings, list):
-                for booking in bookings:
-                    if isinstance(booking, dict):
-                        # Match by customer_id, pet_ids, and dates (if we have dates)
-                        if booking.get("clientId") == customer_id:
-                            booking_pets = booking.get("bookingPets", [])
-                            booking_pet_ids = [p.get("petId") for p in booking_pets if isinstance(p, dict)]
-                            if set(pet_ids) == set(booking_pet_ids) and booking.get("status") == "scheduled":
-                                existing_booking_id = booking.get("id")
-                                existing_booking_found = "found_via_api"
-                                break
+                target_pet_ids = frozenset(pet_ids)
+                # Only this customer's bookings (client index); match status first (cheap), then the exact set of pets
+                for booking in client_bookings(bookings_state.get("extracted", {}), bookings, customer_id):
+                    if booking.get("status") != "scheduled":
+                        continue
+                    booking_pets = booking.get("bookingPets") or ()
+                    if target_pet_ids == frozenset(p.get("petId") for p in booking_pets if isinstance(p, dict)):
+                        existing_booking_id = booking.get("id")
+                        # Copy: the stored booking should only change once the update succeeds
+                        existing_booking = dict(booking)
+                        break
         
         # Create or update booking
-        if existing_booking_id:
-            # Update existing booking
-            # Get full booking object
-            bookings_result_json = await get_bookings(tool_context, professional_id)
-            bookings_result = json.loads(bookings_result_json)
+        if existing_booking_id and existing_booking:
+            # Update the booking found in state with new dates if provided
+            if final_start_date and final_end_date:
+                existing_booking["startDate"] = final_start_date
+                existing_booking["endDate"] = final_end_date
+            if final_start_time:
+                existing_booking["startTime"] = final_start_time
+            if final_end_time:
+                existing_booking["endTime"] = final_end_time
+            if notes:
+                existing_booking["notes"] = notes
             
-            if bookings_result.get("success"):
-                bookings = bookings_result.get("data", [])
-                existing_booking = None
-                for booking in bookings:
-                    if isinstance(booking, dict) and booking.get("id") == existing_booking_id:
-                        existing_booking = booking
-                        break
-                
-                if existing_booking:
-                    # Update booking with new dates if provided
-                    if final_start_date and final_end_date:
-                        existing_booking["startDate"] = final_start_date
-                        existing_booking["endDate"] = final_end_date
-                    if final_start_time:
-                        existing_booking["startTime"] = final_start_time
-                    if final_end_time:
-                        existing_booking["endTime"] = final_end_time
-                    if notes:
-                        existing_booking["notes"] = notes
-                    
-                    update_result_json = await update_booking(tool_context, existing_booking_id, json.dumps(existing_booking))
-                    update_result = json.loads(update_result_json)
-                    
-                    if update_result.get("success"):
-                        return json.dumps({
-                            "customer_id": customer_id,
-                            "professional_id": professional_id_from_state,
-                            "pet_ids": pet_ids,
-                            "matched_service_id": matched_service_id,
-                            "service_name": service_name,
-                            "service_rate_id": service_rate_id,
-                            "service_rate": service_rate,
-                            "start_date": final_start_date or existing_booking.get("startDate"),
-                            "end_date": final_end_date or existing_booking.get("endDate"),
-                            "start_time": final_start_time or existing_booking.get("startTime"),
-                            "end_time": final_end_time or existing_booking.get("endTime"),
-                            "booking_id_from_history": existing_booking_id,
-                            "existing_booking_found": "found_via_api",
-                            "existing_booking_id": existing_booking_id,
-                            "action_taken": "updated",
-                            "booking_id": existing_booking_id,
-                            "status": "updated",
-                            "source": "api",
-                            "message": "Booking updated successfully"
-                        })
+            update_result = await _update_booking(tool_context, existing_booking_id, existing_booking)
+            
+            if update_result.get("success"):
+                return _booking_response(
+                    customer_id=customer_id,
+                    professional_id=professional_id_from_state,
+                    pet_ids=pet_ids,
+                    matched_service_id=matched_service_id,
+                    service_name=service_name,
+                    service_rate_id=service_rate_id,
+                    service_rate=service_rate,
+                    start_date=final_start_date or existing_booking.get("startDate"),
+                    end_date=final_end_date or existing_booking.get("endDate"),
+                    start_time=final_start_time or existing_booking.get("startTime"),
+                    end_time=final_end_time or existing_booking.get("endTime"),
+                    booking_id_from_history=existing_booking_id,
+                    existing_booking_found="found_via_api",
+                    existing_booking_id=existing_booking_id,
+                    action_taken="updated",
+                    booking_id=existing_booking_id,
+                    status="updated",
+                    message="Booking updated successfully"
+                )
         
         # Final safety check: ensure times are set if dates are present
         # This is a last resort check right before creating the booking
@@ -1641,75 +2174,42 @@ async def ensure_booking_exists(
             "weekendFee": 0
         }
         
-        create_result_json = await create_booking(tool_context, json.dumps(booking_data))
-        create_result = json.loads(create_result_json)
+        create_result = await _create_booking(tool_context, booking_data)
         
         if create_result.get("success") and create_result.get("data"):
             booking = create_result["data"]
-            return json.dumps({
-                "customer_id": customer_id,
-                "professional_id": professional_id_from_state,
-                "pet_ids": pet_ids,
-                "matched_service_id": matched_service_id,
-                "service_name": service_name,
-                "service_rate_id": service_rate_id,
-                "service_rate": service_rate,
-                "start_date": booking.get("startDate"),
-                "end_date": booking.get("endDate"),
-                "start_time": booking.get("startTime"),
-                "end_time": booking.get("endTime"),
-                "booking_id_from_history": None,
-                "existing_booking_found": "not_found",
-                "existing_booking_id": None,
-                "action_taken": "created",
-                "booking_id": booking.get("id"),
-                "status": "created",
-                "source": "api",
-                "message": "Booking created successfully"
-            })
+            return _booking_response(
+                customer_id=customer_id,
+                professional_id=professional_id_from_state,
+                pet_ids=pet_ids,
+                matched_service_id=matched_service_id,
+                service_name=service_name,
+                service_rate_id=service_rate_id,
+                service_rate=service_rate,
+                start_date=booking.get("startDate"),
+                end_date=booking.get("endDate"),
+                start_time=booking.get("startTime"),
+                end_time=booking.get("endTime"),
+                action_taken="created",
+                booking_id=booking.get("id"),
+                status="created",
+                message="Booking created successfully"
+            )
         
-        return json.dumps({
-            "customer_id": customer_id,
-            "professional_id": professional_id_from_state,
-            "pet_ids": pet_ids,
-            "matched_service_id": matched_service_id,
-            "service_name": service_name,
-            "service_rate_id": service_rate_id,
-            "service_rate": service_rate,
-            "start_date": None,
-            "end_date": None,
-            "start_time": None,
-            "end_time": None,
-            "booking_id_from_history": None,
-            "existing_booking_found": "not_found",
-            "existing_booking_id": None,
-            "action_taken": "error",
-            "booking_id": None,
-            "status": "error",
-            "source": "api",
-            "message": f"Error creating booking: {create_result.get('error', 'Unknown error')}"
-        })
+        return _booking_response(
+            customer_id=customer_id,
+            professional_id=professional_id_from_state,
+            pet_ids=pet_ids,
+            matched_service_id=matched_service_id,
+            service_name=service_name,
+            service_rate_id=service_rate_id,
+            service_rate=service_rate,
+            message=f"Error creating booking: {create_result.get('error', 'Unknown error')}"
+        )
         
     except Exception as e:
-        return json.dumps({
-            "customer_id": None,
-            "professional_id": professional_id,
-            "pet_ids": [],
-            "matched_service_id": None,
-            "service_name": None,
-            "service_rate_id": None,
-            "service_rate": None,
-            "start_date": None,
-            "end_date": None,
-            "start_time": None,
-            "end_time": None,
-            "booking_id_from_history": None,
-            "existing_booking_found": "not_found",
-            "existing_booking_id": None,
-            "action_taken": "error",
-            "booking_id": None,
-            "status": "error",
-            "source": "api",
-            "message": f"Error ensuring booking exists: {str(e)}"
-        })
+        return _booking_response(
+            professional_id=professional_id,
+            message=f"Error ensuring booking exists: {str(e)}"
+        )
 
@@ -5,9 +5,12 @@ These utilities help extract customer_id, pet_ids, and booking_id from conversat
 history and agent outputs to support skip logic optimizations.
 """
 
-import json
+import functools
+import io
 import re
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
+
+from .serialization import loads
 
 try:
     from google.adk.runners import Runner
@@ -17,6 +20,58 @@ except ImportError:
     SessionService = None
 
 
+# JSON in a markdown code block (```json ... ```)
+_JSON_BLOCK_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+
+
+def _iter_json_objects(text: str):
+    """
+    Yield the outermost balanced {...} substrings of text, left to right.
+    
+    Braces inside JSON strings (including escaped quotes) are ignored. A "{" that is never
+    closed (e.g. a stray brace in prose) may also have put the string tracking out of step
+    with the quotes after it, so the text after the first unclosed "{" is scanned again.
+    Each pass is linear; only unclosed braces cause another pass.
+    """
+    offset = 0
+    while True:
+        openers = []   # Positions of "{" not yet closed
+        in_string = False
+        escaped = False
+        for i, ch in enumerate(text[offset:], offset):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                if openers:
+                    in_string = True
+            elif ch == "{":
+                openers.append(i)
+            elif ch == "}" and openers:
+                start = openers.pop()
+                if not openers:
+                    yield text[start:i + 1]
+        if not openers:
+            return
+        # Everything yielded so far ends before the first unclosed "{"
+        offset = openers[0] + 1
+
+
+def _try_loads(text: str) -> Any:
+    """Decode text as JSON if it starts like an object/array, else (or on failure) return None."""
+    text = text.strip()
+    if text[:1] not in ("{", "["):
+        return None
+    try:
+        return loads(text)
+    except ValueError:
+        return None
+
+
 def parse_agent_output_json(output_text: str) -> Optional[Dict[str, Any]]:
     """
     Safely parse JSON from agent output text.
@@ -33,206 +88,182 @@ def parse_agent_output_json(output_text: str) -> Optional[Dict[str, Any]]:
     if not output_text:
         return None
     
-    # Strategy 1: Try parsing the entire text as JSON
-    try:
-        return json.loads(output_text.strip())
-    except (json.JSONDecodeError, ValueError):
-        pass
+    # Strategy 1: Try parsing the entire text as JSON (only if it can be an object/array;
+    # markdown-wrapped or prose output goes straight to the extraction strategies)
+    parsed = _try_loads(output_text)
+    if parsed is not None:
+        return parsed
     
     # Strategy 2: Extract JSON from markdown code blocks (```json ... ```)
-    json_block_pattern = r'```(?:json)?\s*(\{.*?\})\s*```'
-    matches = re.findall(json_block_pattern, output_text, re.DOTALL)
-    if matches:
-        try:
-            return json.loads(matches[0])
-        except (json.JSONDecodeError, ValueError):
-            pass
+    match = _JSON_BLOCK_RE.search(output_text)
+    if match:
+        parsed = _try_loads(match.group(1))
+        if parsed is not None:
+            return parsed
     
     # Strategy 3: Find JSON object in text (look for {...})
-    json_object_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-    matches = re.findall(json_object_pattern, output_text, re.DOTALL)
-    for match in matches:
-        try:
-            parsed = json.loads(match)
-            if isinstance(parsed, dict):
-                return parsed
-        except (json.JSONDecodeError, ValueError):
-            continue
+    for candidate in _iter_json_objects(output_text):
+        parsed = _try_loads(candidate)
+        if isinstance(parsed, dict):
+            return parsed
     
-    # Strategy 4: Try parsing lines that look like JSON
-    for line in output_text.split('\n'):
+    # Strategy 4: Try parsing lines that look like JSON (iterated without splitting into a list)
+    for line in io.StringIO(output_text):
         line = line.strip()
         if line.startswith('{') and line.endswith('}'):
-            try:
-                return json.loads(line)
-            except (json.JSONDecodeError, ValueError):
-                continue
+            parsed = _try_loads(line)
+            if parsed is not None:
+                return parsed
     
     return None
 
 
-def extract_customer_id_from_context(context: Dict[str, Any]) -> Optional[str]:
+# Fields the context extractors read from an agent output
+_ID_FIELDS = ("customer_id", "pet_ids", "booking_id", "existing_booking_id")
+
+
+@functools.lru_cache(maxsize=256)
+def _id_fields_from_text(output_text: str) -> Optional[Tuple[Tuple[str, Any], ...]]:
     """
-    Extract customer_id from conversation context/agent outputs.
-    
-    Searches in the following order:
-    1. decision_maker_agent output (administrative_decision) - customer_id field
-    2. customer_agent output (customer_result) - customer_id field
-    3. booking_sequential_agent output - customer_id field
-    4. booking_creation_agent output (booking_result) - customer_id field
+    The id fields of a text agent output, memoized as an immutable tuple of (field, value) pairs.
     
-    Args:
-        context: Dictionary containing agent outputs and conversation history
-                 Expected keys: administrative_decision, customer_result, booking_result
-        
-    Returns:
-        customer_id as string if found, None otherwise
+    Agent outputs are re-read by several extractors per turn; the same text is parsed only once.
+    Lists become tuples and nested dicts are dropped, so no cached value can be mutated by a caller.
     """
-    if not context:
+    parsed = parse_agent_output_json(output_text)
+    if parsed is None:
         return None
-    
-    # Check decision_maker_agent output
-    admin_decision = context.get("administrative_decision")
-    if admin_decision:
-        if isinstance(admin_decision, str):
-            parsed = parse_agent_output_json(admin_decision)
-            if parsed and parsed.get("customer_id"):
-                return parsed["customer_id"]
-        elif isinstance(admin_decision, dict) and admin_decision.get("customer_id"):
-            return admin_decision["customer_id"]
-    
-    # Check customer_agent output
-    customer_result = context.get("customer_result")
-    if customer_result:
-        if isinstance(customer_result, str):
-            parsed = parse_agent_output_json(customer_result)
-            if parsed and parsed.get("customer_id"):
-                return parsed["customer_id"]
-        elif isinstance(customer_result, dict) and customer_result.get("customer_id"):
-            return customer_result["customer_id"]
-    
-    # Check booking_creation_agent output (may contain customer_id)
-    booking_result = context.get("booking_result")
-    if booking_result:
-        if isinstance(booking_result, str):
-            parsed = parse_agent_output_json(booking_result)
-            if parsed and parsed.get("customer_id"):
-                return parsed["customer_id"]
-        elif isinstance(booking_result, dict) and booking_result.get("customer_id"):
-            return booking_result["customer_id"]
-    
+    fields = []
+    for field in _ID_FIELDS:
+        value = parsed.get(field)
+        if isinstance(value, list):
+            value = tuple(value)
+        elif isinstance(value, dict):
+            continue
+        fields.append((field, value))
+    return tuple(fields)
+
+
+def _parsed_output(value: Any) -> Optional[Dict[str, Any]]:
+    """Agent output as a dict for the extractors: dicts as-is, id fields of text (memoized), anything else None."""
+    # Outputs stored by store_parsed_output / output_schema agents are already dicts: check those first
+    if not value:
+        return None
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        fields = _id_fields_from_text(value)
+        return dict(fields) if fields is not None else None
     return None
 
 
-def extract_pet_ids_from_context(context: Dict[str, Any]) -> Optional[List[str]]:
+# Agent outputs that may carry each id, in lookup order (earlier sources win)
+_ID_SOURCES = (
+    ("administrative_decision", ("customer_id", "pet_ids", "booking_id")),  # decision_maker_agent
+    ("customer_result", ("customer_id",)),                                  # customer_agent
+    ("pet_result", ("pet_ids",)),                                           # pet_agent
+    ("booking_result", ("customer_id", "pet_ids", "booking_id")),           # booking_creation_agent
+)
+
+
+def extract_ids_from_context(context: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Extract pet_ids array from conversation context/agent outputs.
+    Extract customer_id, pet_ids and booking_id from agent outputs in one pass.
     
-    Searches in the following order:
-    1. decision_maker_agent output (administrative_decision) - pet_ids field
-    2. pet_agent output (pet_result) - pet_ids field
-    3. booking_creation_agent output (booking_result) - pet_ids field
+    Each output is parsed at most once, and only while it can still supply a missing id.
+    Lookup order per id:
+    - customer_id: administrative_decision, customer_result, booking_result
+    - pet_ids: administrative_decision, pet_result, booking_result (lists only)
+    - booking_id: administrative_decision, then booking_result (booking_id, else existing_booking_id)
     
     Args:
         context: Dictionary containing agent outputs and conversation history
-                 Expected keys: administrative_decision, pet_result, booking_result
+                 Expected keys: administrative_decision, customer_result, pet_result, booking_result
         
     Returns:
-        List of pet_ids if found, None otherwise
+        Dict with customer_id, pet_ids and booking_id (None when not found)
     """
+    ids = {"customer_id": None, "pet_ids": None, "booking_id": None}
     if not context:
-        return None
-    
-    # Check decision_maker_agent output
-    admin_decision = context.get("administrative_decision")
-    if admin_decision:
-        if isinstance(admin_decision, str):
-            parsed = parse_agent_output_json(admin_decision)
-            if parsed and parsed.get("pet_ids"):
-                pet_ids = parsed["pet_ids"]
-                if isinstance(pet_ids, list):
-                    return pet_ids
-        elif isinstance(admin_decision, dict) and admin_decision.get("pet_ids"):
-            pet_ids = admin_decision["pet_ids"]
-            if isinstance(pet_ids, list):
-                return pet_ids
+        return ids
     
-    # Check pet_agent output
-    pet_result = context.get("pet_result")
-    if pet_result:
-        if isinstance(pet_result, str):
-            parsed = parse_agent_output_json(pet_result)
-            if parsed and parsed.get("pet_ids"):
-                pet_ids = parsed["pet_ids"]
-                if isinstance(pet_ids, list):
-                    return pet_ids
-        elif isinstance(pet_result, dict) and pet_result.get("pet_ids"):
-            pet_ids = pet_result["pet_ids"]
-            if isinstance(pet_ids, list):
-                return pet_ids
-    
-    # Check booking_creation_agent output (may contain pet_ids)
-    booking_result = context.get("booking_result")
-    if booking_result:
-        if isinstance(booking_result, str):
-            parsed = parse_agent_output_json(booking_result)
-            if parsed and parsed.get("pet_ids"):
-                pet_ids = parsed["pet_ids"]
-                if isinstance(pet_ids, list):
-                    return pet_ids
-        elif isinstance(booking_result, dict) and booking_result.get("pet_ids"):
-            pet_ids = booking_result["pet_ids"]
-            if isinstance(pet_ids, list):
-                return pet_ids
-    
-    return None
+    for key, fields in _ID_SOURCES:
+        missing = [field for field in fields if ids[field] is None]
+        if not missing:
+            continue
+        parsed = _parsed_output(context.get(key))
+        if not parsed:
+            continue
+        for field in missing:
+            value = parsed.get(field)
+            if field == "pet_ids":
+                if value and isinstance(value, (list, tuple)):
+                    ids["pet_ids"] = list(value)  # Copy: never hand out the list stored in state
+            elif field == "booking_id" and key == "booking_result":
+                ids["booking_id"] = value or parsed.get("existing_booking_id") or None
+            elif value:
+                ids[field] = value
+    
+    return ids
+
+
+def extract_customer_id_from_context(context: Dict[str, Any]) -> Optional[str]:
+    """customer_id from agent outputs (see extract_ids_from_context for the lookup order)."""
+    return extract_ids_from_context(context)["customer_id"]
+
+
+def extract_pet_ids_from_context(context: Dict[str, Any]) -> Optional[List[str]]:
+    """pet_ids list from agent outputs (see extract_ids_from_context for the lookup order)."""
+    return extract_ids_from_context(context)["pet_ids"]
 
 
 def extract_booking_id_from_context(context: Dict[str, Any]) -> Optional[str]:
+    """booking_id from agent outputs (see extract_ids_from_context for the lookup order)."""
+    return extract_ids_from_context(context)["booking_id"]
+
+
+def get_state(state: Dict[str, Any], key: str, model: Optional[Any] = None) -> Optional[Any]:
     """
-    Extract booking_id from conversation context/agent outputs.
+    Read an agent output from session state as a parsed dict.
     
-    Searches in the following order:
-    1. decision_maker_agent output (administrative_decision) - booking_id field
-    2. booking_creation_agent output (booking_result) - booking_id field
-    3. booking_creation_agent output (booking_result) - existing_booking_id field
+    Handles both raw output_key text and dicts already stored by store_parsed_output
+    or by agents with an output_schema.
     
     Args:
-        context: Dictionary containing agent outputs and conversation history
-                 Expected keys: administrative_decision, booking_result
+        state: Session state (or any mapping) holding agent outputs
+        key: output_key of the agent (e.g., "customer_result")
+        model: Optional pydantic model class to validate the dict into
         
     Returns:
-        booking_id as string if found, None otherwise
+        Parsed dict (or model instance), or None if missing or unparseable
     """
-    if not context:
+    value = state.get(key) if state else None
+    if isinstance(value, str):
+        value = parse_agent_output_json(value)
+    if not isinstance(value, dict):
         return None
+    return model.model_validate(value) if model is not None else value
+
+
+def store_parsed_output(output_key: str):
+    """
+    Build an after_agent_callback that replaces the agent's output_key text with its parsed dict.
     
-    # Check decision_maker_agent output
-    admin_decision = context.get("administrative_decision")
-    if admin_decision:
-        if isinstance(admin_decision, str):
-            parsed = parse_agent_output_json(admin_decision)
-            if parsed and parsed.get("booking_id"):
-                return parsed["booking_id"]
-        elif isinstance(admin_decision, dict) and admin_decision.get("booking_id"):
-            return admin_decision["booking_id"]
-    
-    # Check booking_creation_agent output
-    booking_result = context.get("booking_result")
-    if booking_result:
-        if isinstance(booking_result, str):
-            parsed = parse_agent_output_json(booking_result)
-            if parsed:
-                # Try booking_id first, then existing_booking_id
-                booking_id = parsed.get("booking_id") or parsed.get("existing_booking_id")
-                if booking_id:
-                    return booking_id
-        elif isinstance(booking_result, dict):
-            booking_id = booking_result.get("booking_id") or booking_result.get("existing_booking_id")
-            if booking_id:
-                return booking_id
+    Downstream agents, tools and context extractors then read a dict from state instead of
+    re-parsing the same JSON text on every hop. Unparseable output is left as text.
     
-    return None
+    Args:
+        output_key: output_key of the agent the callback is attached to
+    """
+    def _store_parsed_output(callback_context):
+        value = callback_context.state.get(output_key)
+        if isinstance(value, str):
+            parsed = parse_agent_output_json(value)
+            if parsed is not None:
+                callback_context.state[output_key] = parsed
+        return None
+
+    return _store_parsed_output
 
 
 def validate_agent_output(output_key: str, output_text: str, expected_fields: List[str]) -> bool:
@@ -256,14 +287,41 @@ def validate_agent_output(output_key: str, output_text: str, expected_fields: Li
         print(f"⚠️ Warning: {output_key} output is not valid JSON")
         return False
     
-    missing_fields = [field for field in expected_fields if field not in parsed]
-    if missing_fields:
+    if not expected_fields:
+        return True
+
+    missing = set(expected_fields).difference(parsed)
+    if missing:
+        # Report in expected_fields order (only on the failure path)
+        missing_fields = [field for field in expected_fields if field in missing]
         print(f"⚠️ Warning: {output_key} output missing fields: {missing_fields}")
         return False
     
     return True
 
 
+# Runner capabilities, probed on the first create_runner_with_logging call (the installed ADK
+# does not change at runtime): whether Runner accepts plugins=, and how to register a plugin otherwise
+_RUNNER_ACCEPTS_PLUGINS: Optional[bool] = None
+_RUNNER_PLUGIN_METHOD: Optional[str] = None  # "register_plugin", "add_plugin", "plugins" or "" (none)
+
+
+def _register_plugin(runner, plugin) -> None:
+    """Register plugin on a runner created without plugins=, using the probed method."""
+    global _RUNNER_PLUGIN_METHOD
+    if _RUNNER_PLUGIN_METHOD is None:
+        _RUNNER_PLUGIN_METHOD = next(
+            (name for name in ("register_plugin", "add_plugin", "plugins") if hasattr(runner, name)), ""
+        )
+    if _RUNNER_PLUGIN_METHOD == "plugins":
+        if not hasattr(runner.plugins, 'append'):
+            runner.plugins = [plugin]
+        else:
+            runner.plugins.append(plugin)
+    elif _RUNNER_PLUGIN_METHOD:
+        getattr(runner, _RUNNER_PLUGIN_METHOD)(plugin)
+
+
 def create_runner_with_logging(
     app=None,
     agent=None,
@@ -290,79 +348,50 @@ def create_runner_with_logging(
     Returns:
         Runner instance with logging plugin registered, or None if Runner is not available
     """
+    global _RUNNER_ACCEPTS_PLUGINS
     if Runner is None:
         return None
     
+    if app is not None:
+        # New style: use App
+        runner_kwargs = {"app": app, "session_service": session_service}
+    else:
+        # Legacy style: use agent and app_name
+        runner_kwargs = {"agent": agent, "app_name": app_name, "session_service": session_service}
+    
     try:
         from .logging_plugin import logging_plugin
-        
-        plugins = [logging_plugin] if enable_logging else []
-        
-        # Try to create runner with plugins parameter
+    except ImportError:
+        # If logging plugin not available, create runner without it
+        return Runner(**runner_kwargs)
+    
+    plugins = [logging_plugin] if enable_logging else []
+    
+    # Try to create runner with plugins parameter (skipped once it is known to be unsupported)
+    if _RUNNER_ACCEPTS_PLUGINS is not False:
         try:
-            if app is not None:
-                # New style: use App
-                runner = Runner(
-                    app=app,
-                    session_service=session_service,
-                    plugins=plugins
-                )
-            else:
-                # Legacy style: use agent and app_name
-                runner = Runner(
-                    agent=agent,
-                    app_name=app_name,
-                    session_service=session_service,
-                    plugins=plugins
-                )
+            runner = Runner(**runner_kwargs, plugins=plugins)
+            _RUNNER_ACCEPTS_PLUGINS = True
             return runner
         except TypeError:
-            # If plugins parameter not supported, create runner and register plugin
-            if app is not None:
-                runner = Runner(
-                    app=app,
-                    session_service=session_service
-                )
-            else:
-                runner = Runner(
-                    agent=agent,
-                    app_name=app_name,
-                    session_service=session_service
-                )
-            
-            if enable_logging:
-                # Try different methods to register plugin
-                if hasattr(runner, 'register_plugin'):
-                    runner.register_plugin(logging_plugin)
-                elif hasattr(runner, 'add_plugin'):
-                    runner.add_plugin(logging_plugin)
-                elif hasattr(runner, 'plugins'):
-                    if not hasattr(runner.plugins, 'append'):
-                        runner.plugins = [logging_plugin]
-                    else:
-                        runner.plugins.append(logging_plugin)
-            
-            return runner
-    except ImportError:
-        # If logging plugin not available, create runner without it
-        if app is not None:
-            return Runner(
-                app=app,
-                session_service=session_service
-            )
-        else:
-            return Runner(
-                agent=agent,
-                app_name=app_name,
-                session_service=session_service
-            )
+            if _RUNNER_ACCEPTS_PLUGINS is None:
+                _RUNNER_ACCEPTS_PLUGINS = False
+    
+    # If plugins parameter not supported, create runner and register plugin
+    runner = Runner(**runner_kwargs)
+    if enable_logging:
+        _register_plugin(runner, logging_plugin)
+    return runner
 
 
 __all__ = [
     "parse_agent_output_json",
+    "extract_ids_from_context",
     "extract_customer_id_from_context",
     "extract_pet_ids_from_context",
     "extract_booking_id_from_context",
+    "get_state",
+    "store_parsed_output",
     "validate_agent_output",
     "create_runner_with_logging",
 ]